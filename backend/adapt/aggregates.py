@@ -0,0 +1,142 @@
+from dataclasses import dataclass
+from typing import Any, Tuple
+
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery
+
+
+'''
+
+Columns for the many to many and reverse foreign key relations of a model,
+e.g. Person.friends, which cannot be columns like the others because each row
+has any number of related objects.
+
+Instead the cell is the number of related objects and the labels of the first
+AGGREGATE_LABELS of them (ordered by primary key) -
+
+    {"count": 12, "labels": ["Person object (3)", "Person object (8)", ...]}
+
+The count and the primary keys of the first few are subqueries of the page
+query itself, so each row costs the same however many objects it is related
+to.  Then the labels for the whole page are looked up with one query per
+related model.
+
+'''
+
+
+AGGREGATE_LABELS = getattr(settings, "ADAPT_AGGREGATE_LABELS", 3)
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    field_path: str
+    related_model: Any
+    # the names of the annotations holding the count and the primary keys
+    count_alias: str
+    pk_aliases: Tuple[str, ...]
+
+    @property
+    def aliases(self):
+        return (self.count_alias, *self.pk_aliases)
+
+
+def is_aggregate_relation(field):
+    return field.many_to_many or field.one_to_many
+
+
+def get_aggregates(model, labels=AGGREGATE_LABELS):
+    return tuple(
+        Aggregate(
+            field_path=field.name,
+            related_model=field.related_model,
+            count_alias=f'_{field.name}__count',
+            pk_aliases=tuple(f'_{field.name}__{index}' for index in range(labels)),
+        )
+        for field in model._meta.get_fields()
+        if is_aggregate_relation(field)
+    )
+
+
+def get_aggregate_column(model, aggregate):
+    return {
+        "name": aggregate.field_path,
+        "model": model.__name__,
+        "field": aggregate.field_path,
+        "related_models": [aggregate.related_model.__name__],
+    }
+
+
+def annotate_aggregates(queryset, aggregates):
+    model = queryset.model
+    related = model.objects.filter(pk=OuterRef("pk"))
+    annotations = {}
+    for aggregate in aggregates:
+        field_path = aggregate.field_path
+        annotations[aggregate.count_alias] = Subquery(
+            related.annotate(count=Count(field_path)).values("count")[:1]
+        )
+        pks = related.filter(**{f'{field_path}__isnull': False}).order_by(f'{field_path}__pk')
+        for index, alias in enumerate(aggregate.pk_aliases):
+            annotations[alias] = Subquery(pks.values(f'{field_path}__pk')[index:index + 1])
+    return queryset.annotate(**annotations)
+
+
+class RowReader:
+    """
+    Turns the rows of values_list(*reader.value_fields) into
+    a tuple of values for each column.
+    """
+
+    def __init__(self, columns, aggregates):
+        # column index -> the Aggregate, for the aggregated columns
+        self.aggregates = {}
+        # the values_list fields for each column
+        self.slices = []
+        self.value_fields = []
+        for index, column in enumerate(columns):
+            if (aggregate := aggregates.get(column["field"])) is not None:
+                self.aggregates[index] = aggregate
+                fields = aggregate.aliases
+            else:
+                fields = (column["field"],)
+            self.slices.append(slice(len(self.value_fields), len(self.value_fields) + len(fields)))
+            self.value_fields.extend(fields)
+
+    def annotate(self, queryset):
+        return annotate_aggregates(queryset, self.aggregates.values())
+
+    def read(self, rows):
+        if not self.aggregates:
+            return rows
+
+        # the labels of every related object on the page, one query per model
+        pks = {}
+        for row in rows:
+            for index, aggregate in self.aggregates.items():
+                pks.setdefault(aggregate.related_model, set()).update(
+                    pk for pk in row[self.slices[index]][1:] if pk is not None
+                )
+        labels = {
+            related_model: {
+                pk: str(obj)
+                for pk, obj in related_model.objects.in_bulk(list(related_pks)).items()
+            }
+            for related_model, related_pks in pks.items()
+            if related_pks
+        }
+
+        read_rows = []
+        for row in rows:
+            values = []
+            for index, part in enumerate(self.slices):
+                if (aggregate := self.aggregates.get(index)) is None:
+                    values.append(row[part.start])
+                    continue
+                count, *related_pks = row[part]
+                model_labels = labels.get(aggregate.related_model, {})
+                values.append({
+                    "count": count or 0,
+                    "labels": [model_labels[pk] for pk in related_pks if pk in model_labels],
+                })
+            read_rows.append(tuple(values))
+        return read_rows
@@ -0,0 +1,311 @@
+import json
+import platform
+import random
+import statistics
+import time
+from itertools import count
+
+import django
+from django.apps import apps
+from django.db import connection, models
+
+from adapt.filters import OrderBy, SortDirection
+from adapt.graph import ModelGraph
+from adapt.graphql import build_schema, build_table
+from adapt.models import Adapt
+from adapt.pages import PageCache
+from adapt.registry import ModelRegistry
+from adapt.state import read_state, state_buffer, state_cache, write_state
+from dummy.models import Address, Person, Work
+
+
+'''
+
+Benchmarks for the schema builder, the table query and the state, run with -
+
+    python manage.py adapt_benchmark --rows 10000 --seed --output results.json
+    python manage.py adapt_benchmark --rows 10000 --baseline results.json
+
+against whichever database is configured.  --seed fills the dummy tables with
+synthetic people (with addresses, work, friends and spouses) until there are
+--rows of them.  The results are json, and given a baseline (the results of an
+earlier run) any benchmark which has got slower by more than the tolerance is
+reported as a regression - as long as it is also slower by more than
+min_delta_ms and by more than twice the spread (standard deviation) of the
+timings, so a fast benchmark which jitters is not.
+
+The schema and graph benchmarks use models made up on the fly which are never
+migrated, so nothing is written for them.  The state benchmarks do save the
+state, and put back what was there before (or delete it, if there was none)
+when they finish.
+
+'''
+
+
+DEFAULT_REPEAT = 20
+
+_model_names = count()
+
+
+def time_it(func, repeat=DEFAULT_REPEAT):
+    """
+    Runs func repeat times, after one run to warm up.  Returns the timings
+    in milliseconds along with whatever the last run returned.
+    """
+    result = func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "stdev_ms": round(statistics.stdev(timings), 3) if repeat > 1 else 0.0,
+        "runs": repeat,
+    }, result
+
+
+def get_environment():
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+    }
+
+
+def get_created_pks(model, objs):
+    """
+    The primary keys of objs, just bulk created.  Not every database
+    returns them, in which case they are the latest rows.
+    """
+    if all(obj.pk is not None for obj in objs):
+        return [obj.pk for obj in objs]
+    return sorted(model.objects.order_by("-pk").values_list("pk", flat=True)[:len(objs)])
+
+
+def seed(rows, batch_size=10000, random_seed=0, log=None):
+    """
+    Adds people, with addresses and work, until there are rows of them.
+    Half are married to the person created before them and each has
+    up to three friends.
+    """
+    rng = random.Random(random_seed)
+    existing = Person.objects.count()
+    if existing >= rows:
+        return existing
+
+    def create(model, number, make):
+        pks = list(model.objects.values_list("pk", flat=True)[:number])
+        for start in range(len(pks), number, batch_size):
+            objs = [make() for _ in range(min(batch_size, number - start))]
+            model.objects.bulk_create(objs)
+            pks.extend(get_created_pks(model, objs))
+        return pks
+
+    address_pks = create(
+        Address,
+        max(1, rows // 10),
+        lambda: Address(post_code=f'{rng.randrange(10 ** 5):05}'),
+    )
+    work_pks = create(
+        Work,
+        max(1, rows // 20),
+        lambda: Work(address_id=rng.choice(address_pks)),
+    )
+
+    names = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi"]
+    Friendship = Person.friends.through
+
+    for start in range(existing, rows, batch_size):
+        people = [
+            Person(
+                name=f'{rng.choice(names)} {index}',
+                age=str(rng.randrange(18, 100)),
+                gender=rng.choice("mf"),
+                address_id=rng.choice(address_pks) if rng.random() < 0.9 else None,
+                work_id=rng.choice(work_pks) if rng.random() < 0.7 else None,
+            )
+            for index in range(start, min(start + batch_size, rows))
+        ]
+        Person.objects.bulk_create(people)
+        pks = get_created_pks(Person, people)
+
+        married = [
+            Person(pk=pk, spouse_id=pks[index - 1])
+            for index, pk in enumerate(pks)
+            if index % 2
+        ]
+        Person.objects.bulk_update(married, ["spouse"])
+
+        friendships = []
+        for pk in pks:
+            for friend_pk in rng.sample(pks, min(3, len(pks))):
+                if friend_pk != pk:
+                    friendships.append(Friendship(from_person_id=pk, to_person_id=friend_pk))
+                    friendships.append(Friendship(from_person_id=friend_pk, to_person_id=pk))
+        Friendship.objects.bulk_create(friendships, ignore_conflicts=True)
+
+        if log is not None:
+            log(f'{start + len(people)} of {rows} people')
+
+    return rows
+
+
+def make_model(name, fields):
+    meta = type("Meta", (), {"app_label": "adapt", "managed": False})
+    return type(name, (models.Model,), {"__module__": __name__, "Meta": meta, **fields})
+
+
+def make_models(number):
+    """
+    number models, each with a few fields and a relation to the one before
+    """
+    made = []
+    for index in range(number):
+        fields = {
+            "name": models.CharField(max_length=100),
+            "size": models.IntegerField(),
+            "created": models.DateField(),
+        }
+        if made:
+            fields["previous"] = models.ForeignKey(made[-1], on_delete=models.CASCADE, related_name="+")
+        made.append(make_model(f'BenchModel{next(_model_names)}', fields))
+    return made
+
+
+def make_deep_models(depth):
+    """
+    depth levels of models, each with two relations to the next level and
+    one to itself, so the number of paths doubles at each level
+    """
+    made = []
+    for level in range(depth):
+        fields = {
+            "name": models.CharField(max_length=100),
+            "parent": models.ForeignKey("self", on_delete=models.CASCADE, null=True, related_name="+"),
+        }
+        if made:
+            fields["left"] = models.ForeignKey(made[-1], on_delete=models.CASCADE, related_name="+")
+            fields["right"] = models.ForeignKey(made[-1], on_delete=models.CASCADE, related_name="+")
+        made.append(make_model(f'BenchDeepModel{next(_model_names)}', fields))
+    # the top level is the one which reaches all the others
+    return made[::-1]
+
+
+def remove_models(made):
+    for model in made:
+        apps.all_models["adapt"].pop(model._meta.model_name, None)
+    apps.clear_cache()
+
+
+def bench_schema(number_of_models, repeat):
+    made = make_models(number_of_models)
+    try:
+        timing, _ = time_it(lambda: build_schema(made), repeat)
+    finally:
+        remove_models(made)
+    return {f'schema.build[models={number_of_models}]': timing}
+
+
+def bench_columns(depth, repeat):
+    made = make_deep_models(depth)
+    top = made[0]
+    results = {}
+    try:
+        # a new graph each time, so nothing is remembered between runs
+        timing, columns = time_it(lambda: ModelGraph().get_columns(top), repeat)
+        results[f'graph.columns.cold[depth={depth}]'] = {**timing, "columns": len(columns)}
+        graph = ModelGraph()
+        timing, columns = time_it(lambda: graph.get_columns(top), repeat)
+        results[f'graph.columns.warm[depth={depth}]'] = {**timing, "columns": len(columns)}
+    finally:
+        remove_models(made)
+    return results
+
+
+def bench_table(page_sizes, repeat):
+    metadata = ModelRegistry([Person]).build().get(Person)
+    # the page cache is only measured by table.cached, the rest read the page
+    cache = PageCache(ttl=60)
+    cache.watch(metadata)
+    results = {}
+    for page_size in page_sizes:
+        timing, table = time_it(lambda: build_table(metadata, first=page_size, cache=None), repeat)
+        results[f'table.first_page[first={page_size}]'] = {**timing, "rows": len(table.values)}
+
+        after = table.page_info.end_cursor
+        timing, table = time_it(lambda: build_table(metadata, first=page_size, after=after, cache=None), repeat)
+        results[f'table.next_page[first={page_size}]'] = {**timing, "rows": len(table.values)}
+
+        order_by = [OrderBy(field="work__address__post_code", direction=SortDirection.DESC)]
+        timing, table = time_it(lambda: build_table(metadata, first=page_size, order_by=order_by, cache=None), repeat)
+        results[f'table.ordered[first={page_size}]'] = {**timing, "rows": len(table.values)}
+
+        timing, table = time_it(lambda: build_table(metadata, first=page_size, search="alice", cache=None), repeat)
+        results[f'table.search[first={page_size}]'] = {**timing, "rows": len(table.values)}
+
+        timing, table = time_it(lambda: build_table(metadata, first=page_size, cache=cache), repeat)
+        results[f'table.cached[first={page_size}]'] = {**timing, "rows": len(table.values)}
+    return results
+
+
+def bench_state(repeat, elements=100):
+    existed = Adapt.objects.exists()
+    original, _ = read_state()
+    results = {}
+    state = json.loads(original)
+    counter = count()
+
+    def save():
+        state["elements"] = [{"id": index, "value": next(counter)} for index in range(elements)]
+        return write_state(json.dumps(state), durable=True)
+
+    def load_cold():
+        state_cache.clear()
+        return read_state()
+
+    try:
+        for name, func in (
+            ("state.save", save),
+            ("state.load_cached", read_state),
+            ("state.load_uncached", load_cold),
+        ):
+            timing, _ = time_it(func, repeat)
+            results[name] = {**timing, "per_second": round(1000 / max(timing["median_ms"], 0.001))}
+    finally:
+        if existed:
+            write_state(original, durable=True)
+        else:
+            state_buffer.flush()
+            Adapt.objects.all().delete()
+            state_cache.clear()
+    return results
+
+
+def run(models=10, depth=6, page_sizes=(10, 50, 500), repeat=DEFAULT_REPEAT, state=True):
+    results = {}
+    results.update(bench_schema(models, repeat))
+    results.update(bench_columns(depth, repeat))
+    results.update(bench_table(page_sizes, repeat))
+    if state:
+        results.update(bench_state(repeat))
+    return {"environment": get_environment(), "results": results}
+
+
+def compare(results, baseline, tolerance=0.2, min_delta_ms=1.0):
+    """
+    (name, baseline ms, ms, ratio, regressed) for every benchmark in both
+    """
+    comparison = []
+    for name, result in results["results"].items():
+        if (base := baseline["results"].get(name)) is None:
+            continue
+        ratio = result["median_ms"] / max(base["median_ms"], 0.001)
+        delta = result["median_ms"] - base["median_ms"]
+        # earlier results have no stdev_ms
+        spread = max(result.get("stdev_ms", 0), base.get("stdev_ms", 0))
+        regressed = ratio > 1 + tolerance and delta > max(min_delta_ms, 2 * spread)
+        comparison.append((name, base["median_ms"], result["median_ms"], ratio, regressed))
+    return comparison
@@ -0,0 +1,46 @@
+import threading
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+'''
+
+Where the persisted queries, the state, the table pages and the row counts
+are cached.
+
+Each is kept in a django cache.  Out of the box that is a LocMemCache of
+this process, which expires and evicts entries itself.  Setting its alias
+setting (ADAPT_PERSISTED_QUERY_CACHE, ADAPT_STATE_CACHE, ADAPT_PAGE_CACHE or
+ADAPT_COUNT_CACHE) to the alias of a django cache in CACHES, e.g. redis,
+shares it between processes instead.
+
+'''
+
+
+local_caches = {}
+local_caches_lock = threading.Lock()
+
+
+def get_local_cache(name, max_entries=300):
+    """
+    The LocMemCache of this process called name
+    """
+    if (cache := local_caches.get(name)) is None:
+        with local_caches_lock:
+            if (cache := local_caches.get(name)) is None:
+                cache = local_caches[name] = LocMemCache(
+                    f'adapt:{name}', {"TIMEOUT": None, "OPTIONS": {"MAX_ENTRIES": max_entries}}
+                )
+    return cache
+
+
+def get_cache(alias, name, max_entries=300):
+    """
+    The django cache called alias, or the local cache called name when
+    there is no alias.  caches gives each thread its own connection so
+    this is looked up each time rather than kept.
+    """
+    if alias:
+        return caches[alias]
+    return get_local_cache(name, max_entries)
@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+import strawberry
+from django import forms
+from django.db.models import Q
+from django.utils.encoding import force_str
+from strawberry.dataloader import DataLoader
+
+from adapt.filters import is_string_field
+from adapt.pagination import (
+    PageInfo,
+    PaginationError,
+    decode_cursor,
+    encode_cursor,
+    get_page_size,
+    paginate,
+)
+from adapt.threads import run_in_db_thread
+
+
+'''
+
+The options for the choice fields of the forms.
+
+Fields with a fixed list of choices (e.g. Person.gender) have them worked out
+once, when the schema is built.  Fields which choose model instances are
+paginated and searched in the database.  Every lookup made while resolving one
+request goes through a DataLoader so lookups which would run the same query
+(e.g. Person.friends and Person.spouse both choose from Person) share it, and
+the number of queries is bounded by the number of models chosen from rather
+than the number of fields.
+
+'''
+
+
+@strawberry.type
+class Choice:
+    value: str
+    label: str
+
+
+@strawberry.type
+class Choices:
+    mutation_name: str
+    field: str
+    choices: List[Choice]
+    page_info: PageInfo
+
+
+@dataclass(frozen=True)
+class ChoiceField:
+    field: Any
+    # the choices of a field with a fixed list of them, otherwise None
+    static_choices: Optional[Tuple[Choice, ...]]
+
+
+def get_static_choices(field):
+    if isinstance(field, forms.ModelChoiceField):
+        return None
+    return tuple(
+        Choice(value=force_str(value), label=force_str(label))
+        for value, label in field.choices
+    )
+
+
+def get_choice_fields(form_classes):
+    """
+    (mutation name, field name) -> ChoiceField for every choice field in the
+    (mutation name, form class) pairs
+    """
+    return {
+        (mutation_name, field_name): ChoiceField(field=field, static_choices=get_static_choices(field))
+        for mutation_name, form in form_classes
+        for field_name, field in form.base_fields.items()
+        if isinstance(field, forms.ChoiceField)
+    }
+
+
+def decode_index_cursor(cursor):
+    """
+    The cursors of the static choices are the index of the choice
+    """
+    [index] = decode_cursor(cursor, [None])
+    if not isinstance(index, int) or isinstance(index, bool) or index < 0:
+        raise PaginationError(f'Invalid cursor "{cursor}"')
+    return index
+
+
+def page_static_choices(choices, search=None, first=None, after=None):
+    if search:
+        search = search.lower()
+        choices = [choice for choice in choices if search in choice.label.lower()]
+    start = decode_index_cursor(after) + 1 if after else 0
+    page_size = get_page_size(first, None)
+    page = choices[start:start + page_size]
+    return (
+        [(encode_cursor([start + index]), choice) for index, choice in enumerate(page)],
+        PageInfo(
+            has_next_page=len(choices) > start + page_size,
+            has_previous_page=start > 0,
+            start_cursor=encode_cursor([start]) if page else None,
+            end_cursor=encode_cursor([start + len(page) - 1]) if page else None,
+        ),
+    )
+
+
+def get_choices_queryset(field, search=None):
+    queryset = field.queryset
+    if search:
+        q = Q()
+        for model_field in queryset.model._meta.concrete_fields:
+            if is_string_field(model_field):
+                q |= Q(**{f'{model_field.name}__icontains': search})
+        queryset = queryset.filter(q)
+    return queryset
+
+
+def get_choice_key(field):
+    """
+    The field of the model the choice value is taken from
+    """
+    if field.to_field_name in (None, field.queryset.model._meta.pk.name):
+        return "pk"
+    return field.to_field_name
+
+
+def page_model_choices(field, search=None, first=None, after=None):
+    key = get_choice_key(field)
+    rows, page_info = paginate(
+        get_choices_queryset(field, search),
+        ordering=[(key, False)],
+        first=first,
+        after=after,
+    )
+    return (
+        [
+            (cursor, Choice(value=force_str(getattr(obj, key)), label=field.label_from_instance(obj)))
+            for cursor, obj in rows
+        ],
+        page_info,
+    )
+
+
+def load_choices(choice_fields, keys):
+    """
+    The batch function of the DataLoader.  keys are
+    (mutation name, field name, search, first, after) tuples.
+    """
+    pages = {}
+    results = []
+    for mutation_name, field_name, search, first, after in keys:
+        choice_field = choice_fields[(mutation_name, field_name)]
+        if choice_field.static_choices is not None:
+            rows, page_info = page_static_choices(
+                list(choice_field.static_choices), search, first, after
+            )
+        else:
+            # fields choosing from the same queryset share the query
+            field = choice_field.field
+            page_key = (str(field.queryset.query), get_choice_key(field), search, first, after)
+            if page_key not in pages:
+                pages[page_key] = page_model_choices(field, search, first, after)
+            rows, page_info = pages[page_key]
+        results.append(
+            Choices(
+                mutation_name=mutation_name,
+                field=field_name,
+                choices=[choice for _, choice in rows],
+                page_info=page_info,
+            )
+        )
+    return results
+
+
+def get_choices_loader(info, choice_fields):
+    """
+    One DataLoader per request, kept on the context.
+    """
+    async def load(keys):
+        return await run_in_db_thread(load_choices, choice_fields, keys)
+
+    context = info.context
+    if context is None:
+        return DataLoader(load_fn=load)
+    if (loader := getattr(context, "choices_loader", None)) is None:
+        loader = DataLoader(load_fn=load)
+        setattr(context, "choices_loader", loader)
+    return loader
+
+
+def create_choices_field(choice_fields):
+
+    async def get_choices(
+        info,
+        mutation_name: str,
+        field: str,
+        search: Optional[str] = None,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+    ) -> Choices:
+        if (mutation_name, field) not in choice_fields:
+            raise LookupError(f'"{field}" is not a choice field of {mutation_name}')
+        loader = get_choices_loader(info, choice_fields)
+        return await loader.load((mutation_name, field, search, first, after))
+
+    return strawberry.field(name="choices", resolver=get_choices)
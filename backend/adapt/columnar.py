@@ -0,0 +1,133 @@
+import array
+import sys
+
+import msgpack
+from django.conf import settings
+
+
+'''
+
+A page of the table as columns rather than rows.
+
+Each column is one array of values, without the nulls, and a bitmap of which
+rows are null (bit i, least significant first, is set when row i is null).
+The bitmap is left out when there are no nulls.  A string column with few
+distinct values, e.g. Person.gender, is sent as a dictionary of the distinct
+values and, for each row, the index of its value in the dictionary -
+
+    {"nulls": null, "dictionary": ["f", "m"], "values": [1, 0, 0, 1, ...]}
+
+The same page can be had as MessagePack (see pack_table) from the table endpoint,
+where the integer, float and dictionary index columns are packed arrays of
+little endian numbers rather than a msgpack array each.  Integers are packed
+as 32 or 64 bit integers, never as doubles, so that they are exact.
+
+'''
+
+
+# a dictionary with more values than this is not worth it
+DICTIONARY_MAX_SIZE = getattr(settings, "ADAPT_DICTIONARY_MAX_SIZE", 256)
+
+# the column types which are strings once formatted, see adapt.formatters
+DICTIONARY_TYPES = {"string", "date", "decimal", "uuid"}
+
+INT32_MIN, INT32_MAX = -(2 ** 31), 2 ** 31 - 1
+
+
+def get_null_bitmap(values):
+    """
+    None if no value is null
+    """
+    bitmap = bytearray((len(values) + 7) // 8)
+    has_nulls = False
+    for index, value in enumerate(values):
+        if value is None:
+            bitmap[index >> 3] |= 1 << (index & 7)
+            has_nulls = True
+    return bytes(bitmap) if has_nulls else None
+
+
+def get_dictionary(values, max_size=DICTIONARY_MAX_SIZE):
+    """
+    The distinct values in the order they are first seen, or None when
+    a dictionary would not make the column any smaller
+    """
+    indexes = {}
+    for value in values:
+        if value not in indexes:
+            if len(indexes) == max_size:
+                return None
+            indexes[value] = len(indexes)
+    if len(indexes) * 2 > len(values):
+        return None
+    return indexes
+
+
+def encode_column(column_type, values):
+    """
+    values are the formatted values of one column of the page
+    """
+    nulls = get_null_bitmap(values)
+    if nulls is not None:
+        values = [value for value in values if value is not None]
+    dictionary = None
+    if column_type in DICTIONARY_TYPES and values:
+        if (indexes := get_dictionary(values)) is not None:
+            dictionary = list(indexes)
+            values = [indexes[value] for value in values]
+    return {"nulls": nulls, "dictionary": dictionary, "values": values}
+
+
+def encode_table(columns, types, rows):
+    """
+    columns are the field paths, types the type of each (see ColumnFormatter)
+    and rows the formatted rows of the page
+    """
+    return {
+        "length": len(rows),
+        "columns": [
+            {"field": field, "type": column_type, **encode_column(column_type, list(values))}
+            for field, column_type, values in zip(columns, types, zip(*rows) if rows else [()] * len(columns))
+        ],
+    }
+
+
+def pack_numbers(typecode, values):
+    numbers = array.array(typecode, values)
+    if sys.byteorder != "little":
+        numbers.byteswap()
+    return numbers.tobytes()
+
+
+def get_packed_values(column):
+    """
+    The values of an encoded column as little endian bytes, where they
+    are all numbers, along with their type.  Otherwise None.
+    """
+    values = column["values"]
+    if column["dictionary"] is not None:
+        if len(column["dictionary"]) <= 2 ** 8:
+            return "u8", pack_numbers("B", values)
+        if len(column["dictionary"]) <= 2 ** 16:
+            return "u16", pack_numbers("H", values)
+        return None
+    if column["type"] == "integer":
+        if all(INT32_MIN <= value <= INT32_MAX for value in values):
+            return "i32", pack_numbers("i", values)
+        # a double cannot hold every integer above 2 ** 53, e.g. big auto ids
+        return "i64", pack_numbers("q", values)
+    if column["type"] == "float":
+        return "f64", pack_numbers("d", values)
+    return None
+
+
+def pack_table(table):
+    """
+    encode_table, with the number columns packed, as MessagePack
+    """
+    columns = []
+    for column in table["columns"]:
+        if (packed := get_packed_values(column)) is not None:
+            column = {**column, "packing": packed[0], "values": packed[1]}
+        columns.append(column)
+    return msgpack.packb({**table, "columns": columns}, use_bin_type=True)
@@ -0,0 +1,217 @@
+from dataclasses import dataclass
+
+from django.conf import settings
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLNonNull,
+    InlineFragmentNode,
+    get_named_type,
+    get_operation_ast,
+    is_composite_type,
+    value_from_ast_untyped,
+)
+from graphql.language import FragmentDefinitionNode
+from strawberry.extensions import Extension
+
+from adapt.documents import cached_validate_document
+from adapt.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+'''
+
+Limits on how much work a single query can ask for, checked before it is run.
+
+    depth   how deeply the fields are nested
+    nodes   an estimate of how many fields the response will have
+    cost    an estimate of how much work the resolvers will do
+
+Only the paginated lists are counted as many values - the lists with a first
+or last argument and the lists in PAGE_FIELDS (or ADAPT_QUERY_PAGE_FIELDS),
+which are the page of the field they belong to (e.g. table(first: 10) { rows }).
+They are assumed to be as long as that argument, otherwise DEFAULT_LIST_SIZE.
+Every other list (e.g. forms, or the errors of a mutation) is as long as the
+schema or the input makes it, so is counted once.  Each object in the response
+costs 1, and each scalar nothing, unless the field has a cost in FIELD_COSTS
+(or ADAPT_QUERY_FIELD_COSTS).
+
+The budgets are ADAPT_MAX_QUERY_DEPTH, ADAPT_MAX_QUERY_NODES and
+ADAPT_MAX_QUERY_COST, any of which can be None for no limit.  Introspection
+fields do not count.
+
+'''
+
+
+MAX_QUERY_DEPTH = getattr(settings, "ADAPT_MAX_QUERY_DEPTH", 10)
+MAX_QUERY_NODES = getattr(settings, "ADAPT_MAX_QUERY_NODES", 50000)
+MAX_QUERY_COST = getattr(settings, "ADAPT_MAX_QUERY_COST", 1000)
+
+DEFAULT_LIST_SIZE = getattr(settings, "ADAPT_QUERY_DEFAULT_LIST_SIZE", DEFAULT_PAGE_SIZE)
+
+# "<type>.<field>" -> cost
+FIELD_COSTS = {
+    "Query.table": 10,
+    "Query.aggregate": 10,
+    "Query.choices": 5,
+    "Table.totalCount": 5,
+    **getattr(settings, "ADAPT_QUERY_FIELD_COSTS", {}),
+}
+
+# "<type>.<field>" of the lists which are the page of a paginated field
+PAGE_FIELDS = {
+    "Table.rows",
+    "AggregateResult.rows",
+    "Choices.choices",
+    *getattr(settings, "ADAPT_QUERY_PAGE_FIELDS", []),
+}
+
+
+@dataclass
+class QueryCost:
+    depth: int = 0
+    nodes: int = 0
+    cost: int = 0
+
+    def as_dict(self):
+        return {"depth": self.depth, "nodes": self.nodes, "cost": self.cost}
+
+    def get_errors(self, max_depth=MAX_QUERY_DEPTH, max_nodes=MAX_QUERY_NODES, max_cost=MAX_QUERY_COST):
+        errors = []
+        for name, value, limit in (
+            ("depth", self.depth, max_depth),
+            ("nodes", self.nodes, max_nodes),
+            ("cost", self.cost, max_cost),
+        ):
+            if limit is not None and value > limit:
+                errors.append(f'the query {name} of {value} is over the limit of {limit}')
+        return errors
+
+
+def is_list_type(type_):
+    if isinstance(type_, GraphQLNonNull):
+        type_ = type_.of_type
+    return isinstance(type_, GraphQLList)
+
+
+def is_paginated(field):
+    return "first" in field.args or "last" in field.args
+
+
+def get_list_size(field_node, variables):
+    for argument in field_node.arguments:
+        if argument.name.value in ("first", "last"):
+            size = value_from_ast_untyped(argument.value, variables)
+            if isinstance(size, int):
+                return max(0, min(size, MAX_PAGE_SIZE))
+    return None
+
+
+class QueryCostCalculator:
+
+    def __init__(self, schema, document, variables=None, max_depth=MAX_QUERY_DEPTH):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        # nothing below this depth is looked at, the query is over the limit anyway
+        self.max_depth = max_depth
+
+    def calculate(self, operation):
+        cost = QueryCost()
+        root_type = self.schema.get_root_type(operation.operation)
+        self._add(cost, operation.selection_set, root_type, 1, None, 1)
+        return cost
+
+    def _add(self, cost, selection_set, parent_type, multiplier, page_size, depth):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                self._add_field(cost, selection, parent_type, multiplier, page_size, depth)
+            elif isinstance(selection, InlineFragmentNode):
+                type_ = parent_type
+                if selection.type_condition is not None:
+                    type_ = self.schema.get_type(selection.type_condition.name.value)
+                self._add(cost, selection.selection_set, type_, multiplier, page_size, depth)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments[selection.name.value]
+                type_ = self.schema.get_type(fragment.type_condition.name.value)
+                self._add(cost, fragment.selection_set, type_, multiplier, page_size, depth)
+
+    def _add_field(self, cost, field_node, parent_type, multiplier, page_size, depth):
+        name = field_node.name.value
+        if name.startswith("__"):
+            return
+        field = parent_type.fields[name]
+        named_type = get_named_type(field.type)
+
+        if is_paginated(field):
+            page_size = get_list_size(field_node, self.variables)
+        if is_list_type(field.type) and (is_paginated(field) or f'{parent_type.name}.{name}' in PAGE_FIELDS):
+            # the list uses up the page size
+            multiplier *= page_size if page_size is not None else DEFAULT_LIST_SIZE
+            page_size = None
+
+        # multiplier is now the number of values the field resolves to
+        cost.depth = max(cost.depth, depth)
+        cost.nodes += multiplier
+        default_cost = 1 if is_composite_type(named_type) else 0
+        cost.cost += FIELD_COSTS.get(f'{parent_type.name}.{name}', default_cost) * multiplier
+
+        if field_node.selection_set is None or (self.max_depth is not None and depth > self.max_depth):
+            return
+        self._add(cost, field_node.selection_set, named_type, multiplier, page_size, depth + 1)
+
+
+def get_query_cost(schema, document, operation_name=None, variables=None):
+    """
+    The QueryCost of the operation, or None if there is no such operation
+    """
+    if (operation := get_operation_ast(document, operation_name)) is None:
+        return None
+    return QueryCostCalculator(schema, document, variables).calculate(operation)
+
+
+class QueryCostExtension(Extension):
+    """
+    Rejects queries over the budgets, and adds the cost of the query
+    to the "cost" key of the response extensions.
+
+    Must come after DocumentCacheExtension, if it is used.
+    """
+
+    cost = None
+
+    def on_validation_start(self):
+        execution_context = self.execution_context
+        if execution_context.errors is None:
+            execution_context.errors = cached_validate_document(
+                execution_context.schema._schema,
+                execution_context.graphql_document,
+                execution_context.validation_rules,
+            )
+        if execution_context.errors:
+            return
+
+        self.cost = get_query_cost(
+            execution_context.schema._schema,
+            execution_context.graphql_document,
+            execution_context.operation_name,
+            execution_context.variables,
+        )
+        if self.cost is not None and (messages := self.cost.get_errors()):
+            execution_context.errors = [
+                GraphQLError(
+                    f'Query is too complex: {message}',
+                    extensions={"code": "QUERY_TOO_COMPLEX", "cost": self.cost.as_dict()},
+                )
+                for message in messages
+            ]
+
+    def get_results(self):
+        if self.cost is None:
+            return {}
+        return {"cost": self.cost.as_dict()}
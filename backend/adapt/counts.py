@@ -0,0 +1,136 @@
+import hashlib
+import json
+from typing import Optional
+
+import strawberry
+from django.conf import settings
+from django.db import connections
+
+from adapt.caching import get_cache
+
+
+'''
+
+Row counts for the table query which never scan the whole table.
+
+First the rows are counted up to EXACT_COUNT_THRESHOLD, with a LIMIT, so the
+cost is bounded.  If there are fewer the count is exact.  Otherwise on Postgres
+we use the planner's estimate - pg_class.reltuples for the whole table, or the
+rows EXPLAIN expects the filtered query to return.  Other databases (e.g.
+SQLite, in development) just count.
+
+Counts are cached, by model and query, for COUNT_CACHE_TTL seconds, in the
+ADAPT_COUNT_CACHE cache (see adapt.caching).
+
+'''
+
+
+EXACT_COUNT_THRESHOLD = getattr(settings, "ADAPT_EXACT_COUNT_THRESHOLD", 10000)
+COUNT_CACHE_TTL = getattr(settings, "ADAPT_COUNT_CACHE_TTL", 30)
+
+
+@strawberry.type
+class TotalCount:
+    count: int
+    # false when the count is the database's estimate
+    exact: bool
+
+
+def get_count_key(queryset):
+    sql, params = queryset.query.sql_with_params()
+    description = json.dumps([queryset.model._meta.label, sql, [str(param) for param in params]])
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def get_reltuples(connection, model):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # -1 if the table has never been analyzed
+    return row[0] if row and row[0] >= 0 else None
+
+
+def get_planner_estimate(connection, queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_estimate(queryset):
+    """
+    The planner's estimate of the number of rows, or None if the
+    database cannot tell us.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    if not queryset.query.where:
+        if (estimate := get_reltuples(connection, queryset.model)) is not None:
+            return estimate
+    return get_planner_estimate(connection, queryset)
+
+
+def count_rows(queryset, threshold=EXACT_COUNT_THRESHOLD):
+    queryset = queryset.order_by()
+    if (count := queryset[:threshold].count()) < threshold:
+        return TotalCount(count=count, exact=True)
+    if (estimate := get_estimate(queryset)) is not None:
+        # there are at least threshold rows, whatever the statistics say
+        return TotalCount(count=max(estimate, threshold), exact=False)
+    return TotalCount(count=queryset.count(), exact=True)
+
+
+class CountCache:
+    """
+    count key -> TotalCount, for ttl seconds
+    """
+
+    KEY = "adapt:count:{key}"
+
+    def __init__(self, ttl=30, maxsize=1000, alias=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return get_cache(self.alias, "counts", self.maxsize)
+
+    def get(self, key) -> Optional[TotalCount]:
+        if (value := self.cache.get(self.KEY.format(key=key))) is not None:
+            return TotalCount(**value)
+        return None
+
+    def set(self, key, total_count):
+        self.cache.set(
+            self.KEY.format(key=key),
+            {"count": total_count.count, "exact": total_count.exact},
+            timeout=self.ttl,
+        )
+
+    def clear(self):
+        # the counts of other processes are left to expire
+        if not self.alias:
+            self.cache.clear()
+
+
+count_cache = CountCache(
+    ttl=COUNT_CACHE_TTL,
+    alias=getattr(settings, "ADAPT_COUNT_CACHE", None),
+)
+
+
+def get_total_count(queryset):
+    queryset = queryset.order_by()
+    key = get_count_key(queryset)
+    if (total_count := count_cache.get(key)) is None:
+        total_count = count_rows(queryset)
+        count_cache.set(key, total_count)
+    return total_count
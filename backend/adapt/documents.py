@@ -0,0 +1,124 @@
+import hashlib
+from functools import lru_cache
+
+from django.conf import settings
+from graphql import GraphQLError
+from strawberry.extensions import Extension
+from strawberry.schema.execute import parse_document, validate_document
+
+from adapt.caching import get_cache, get_local_cache
+
+
+'''
+
+The frontend only ever sends a handful of operations so there is no point
+parsing and validating the same query text on every request.
+
+DocumentCacheExtension keeps the parsed and validated documents in an LRU cache.
+
+PersistedQueries implements automatic persisted queries, as the apollo client
+does them -
+
+    https://www.apollographql.com/docs/apollo-server/performance/apq/
+
+The client sends the sha256 hash of the query instead of the query.  If we have
+not seen the hash before we say so and the client sends the query along with
+the hash, which we remember from then on.
+
+'''
+
+
+DOCUMENT_CACHE_SIZE = getattr(settings, "ADAPT_DOCUMENT_CACHE_SIZE", 256)
+
+
+@lru_cache(maxsize=DOCUMENT_CACHE_SIZE)
+def cached_parse_document(query):
+    return parse_document(query)
+
+
+@lru_cache(maxsize=DOCUMENT_CACHE_SIZE)
+def cached_validate_document(schema, document, validation_rules):
+    return validate_document(schema, document, validation_rules)
+
+
+class DocumentCacheExtension(Extension):
+    """
+    Because the parsed document for a query is cached the same document
+    instance comes back each time, which is what the validation is cached on.
+    """
+
+    def on_parsing_start(self):
+        try:
+            self.execution_context.graphql_document = cached_parse_document(
+                self.execution_context.query
+            )
+        except GraphQLError:
+            # left for strawberry to parse again, which reports the syntax
+            # error in the response.  This runs outside its error handling.
+            pass
+
+    def on_validation_start(self):
+        execution_context = self.execution_context
+        errors = cached_validate_document(
+            execution_context.schema._schema,
+            execution_context.graphql_document,
+            execution_context.validation_rules,
+        )
+        # strawberry only validates the document itself when errors is None
+        execution_context.errors = errors
+
+
+class PersistedQueryNotFound(Exception):
+    code = "PERSISTED_QUERY_NOT_FOUND"
+    message = "PersistedQueryNotFound"
+
+
+class PersistedQueryMismatch(Exception):
+    code = "PERSISTED_QUERY_HASH_MISMATCH"
+    message = "provided sha does not match query"
+
+
+def get_query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+class PersistedQueries:
+    """
+    hash -> query, kept in this process in front of the
+    ADAPT_PERSISTED_QUERY_CACHE cache, if there is one, so a query
+    registered with one process is known to the others.
+    """
+
+    KEY = "adapt:persisted_query:{hash}"
+
+    def __init__(self, maxsize=1000, alias=None):
+        self.maxsize = maxsize
+        self.alias = alias
+
+    @property
+    def local_cache(self):
+        return get_local_cache("persisted_queries", self.maxsize)
+
+    def get(self, query_hash):
+        key = self.KEY.format(hash=query_hash)
+        if (query := self.local_cache.get(key)) is not None:
+            return query
+        if self.alias:
+            if (query := get_cache(self.alias, "persisted_queries").get(key)) is not None:
+                self.local_cache.set(key, query)
+                return query
+        raise PersistedQueryNotFound()
+
+    def register(self, query_hash, query):
+        if get_query_hash(query) != query_hash:
+            raise PersistedQueryMismatch()
+        key = self.KEY.format(hash=query_hash)
+        self.local_cache.set(key, query)
+        if self.alias:
+            get_cache(self.alias, "persisted_queries").set(key, query, timeout=None)
+
+
+persisted_queries = PersistedQueries(
+    maxsize=getattr(settings, "ADAPT_PERSISTED_QUERIES_SIZE", 1000),
+    alias=getattr(settings, "ADAPT_PERSISTED_QUERY_CACHE", None),
+)
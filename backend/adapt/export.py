@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from adapt.aggregates import RowReader
+from adapt.filters import ColumnFilter, FilterError, OrderBy, SortDirection, filter_queryset, get_ordering, get_selected_columns
+from adapt.formatters import format_rows
+from adapt.pagination import get_order_by
+from adapt.search import is_ranked, rank_queryset
+from adapt.threads import iterate_in_db_thread
+
+
+'''
+
+Exporting every row of a registered model, as CSV or NDJSON (one json object
+per line).
+
+The columns, filters, ordering and search are the same as for the table query.
+The rows are read with a server side cursor, CHUNK_SIZE at a time, formatted
+and written out before the next chunk is read, so memory use does not grow
+with the size of the table.
+
+'''
+
+
+CHUNK_SIZE = getattr(settings, "ADAPT_EXPORT_CHUNK_SIZE", 2000)
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def get_filters(data):
+    """
+    data is the list of filters as the table query takes them e.g.
+    [{"field": "name", "contains": "smith"}, {"field": "age", "in": ["1", "2"]}]
+    """
+    try:
+        return [
+            ColumnFilter(**{("in_" if key == "in" else key): value for key, value in item.items()})
+            for item in data
+        ]
+    except (AttributeError, TypeError):
+        raise FilterError(f'Invalid filters {json.dumps(data)}')
+
+
+def get_order_bys(data):
+    """
+    e.g. [{"field": "name", "direction": "DESC"}]
+    """
+    try:
+        return [
+            OrderBy(field=item["field"], direction=SortDirection[item.get("direction", "ASC")])
+            for item in data
+        ]
+    except (AttributeError, KeyError, TypeError):
+        raise FilterError(f'Invalid orderBy {json.dumps(data)}')
+
+
+def get_export_rows(metadata, columns, filters=None, order_by=None, search=None):
+    """
+    Chunks of formatted rows
+    """
+    queryset = filter_queryset(
+        metadata.model.objects.all(),
+        metadata,
+        filters=filters,
+        search=search,
+    )
+    ranked = is_ranked(queryset, search, order_by)
+    if ranked:
+        queryset = rank_queryset(queryset, search)
+    reader = RowReader(columns, metadata.aggregates)
+    queryset = reader.annotate(queryset).order_by(
+        *get_order_by(get_ordering(metadata, order_by, ranked=ranked))
+    ).values_list(*reader.value_fields)
+
+    formatters = [metadata.formatters[column["field"]] for column in columns]
+    chunk = []
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            yield format_rows(formatters, reader.read(chunk))
+            chunk = []
+    if chunk:
+        yield format_rows(formatters, reader.read(chunk))
+
+
+def write_csv(field_paths, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(field_paths)
+    for chunk in chunks:
+        # the aggregated columns are written as json
+        writer.writerows(
+            [json.dumps(value) if isinstance(value, dict) else value for value in row]
+            for row in chunk
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write_ndjson(field_paths, chunks):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for chunk in chunks:
+        yield "".join(
+            encoder.encode(dict(zip(field_paths, row))) + "\n"
+            for row in chunk
+        )
+
+
+WRITERS = {
+    "csv": write_csv,
+    "ndjson": write_ndjson,
+}
+
+
+def write_export(format, metadata, columns, filters=None, order_by=None, search=None):
+    chunks = get_export_rows(metadata, columns, filters=filters, order_by=order_by, search=search)
+    return WRITERS[format]([column["field"] for column in columns], chunks)
+
+
+def export(metadata, format, columns=None, filters=None, order_by=None, search=None):
+    """
+    Returns an iterable over the export as strings, see DbThreadIterator.
+    Any problem with the columns or format is raised straight away rather
+    than part way through.
+    """
+    if format not in WRITERS:
+        raise FilterError(f'"{format}" is not an export format, use one of {", ".join(WRITERS)}')
+    columns = get_selected_columns(metadata, columns)
+    # likewise for the filters and ordering
+    filter_queryset(metadata.model.objects.none(), metadata, filters=filters, search=search)
+    get_ordering(metadata, order_by)
+
+    # written out in the thread too, so the event loop only passes it on
+    return iterate_in_db_thread(
+        write_export,
+        format,
+        metadata,
+        columns,
+        filters=filters,
+        order_by=order_by,
+        search=search,
+    )
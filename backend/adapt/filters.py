@@ -0,0 +1,157 @@
+from enum import Enum
+from typing import List, Optional
+
+import strawberry
+from django.core.exceptions import ValidationError
+from django.db.models import CharField, Q, TextField
+
+from adapt.search import SEARCH_RANK, search_queryset, uses_full_text_search
+
+
+'''
+
+Filtering, ordering and searching for the table query.
+
+Everything is compiled into Q objects and order_by expressions on the one
+queryset so the work is done by the database.  Every field path the client
+sends is checked against the columns of the model in the registry first, so
+the client cannot filter or order on anything it could not already see.
+
+Search is full text search for the models which have a search vector on
+Postgres, see adapt.search.
+
+'''
+
+
+STRING_FIELDS = (CharField, TextField)
+
+
+class FilterError(Exception):
+    pass
+
+
+@strawberry.enum
+class SortDirection(Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+
+@strawberry.input
+class OrderBy:
+    field: str
+    direction: SortDirection = SortDirection.ASC
+
+
+@strawberry.input
+class ColumnFilter:
+    field: str
+    eq: Optional[str] = None
+    in_: Optional[List[str]] = strawberry.field(name="in", default=None)
+    # the lower and upper bound, inclusive
+    range: Optional[List[str]] = None
+    isnull: Optional[bool] = None
+    contains: Optional[str] = None
+
+
+def is_string_field(field):
+    return isinstance(field, STRING_FIELDS)
+
+
+def get_field(metadata, field_path):
+    try:
+        return metadata.fields[field_path]
+    except KeyError:
+        raise FilterError(f'"{field_path}" is not a column of {metadata.model.__name__}')
+
+
+def to_python(field, field_path, value):
+    try:
+        return field.to_python(value)
+    except ValidationError as e:
+        raise FilterError(f'Invalid value for "{field_path}": {" ".join(e.messages)}')
+
+
+def get_column_filter_q(metadata, column_filter):
+    field_path = column_filter.field
+    field = get_field(metadata, field_path)
+    q = Q()
+
+    if column_filter.eq is not None:
+        q &= Q(**{field_path: to_python(field, field_path, column_filter.eq)})
+
+    if column_filter.in_ is not None:
+        q &= Q(**{
+            f'{field_path}__in': [
+                to_python(field, field_path, value) for value in column_filter.in_
+            ]
+        })
+
+    if column_filter.range is not None:
+        if len(column_filter.range) != 2:
+            raise FilterError(f'range for "{field_path}" must be a lower and an upper bound')
+        q &= Q(**{
+            f'{field_path}__range': [
+                to_python(field, field_path, value) for value in column_filter.range
+            ]
+        })
+
+    if column_filter.isnull is not None:
+        q &= Q(**{f'{field_path}__isnull': column_filter.isnull})
+
+    if column_filter.contains is not None:
+        if not is_string_field(field):
+            raise FilterError(f'contains is only supported for text columns, not "{field_path}"')
+        q &= Q(**{f'{field_path}__icontains': column_filter.contains})
+
+    return q
+
+
+def get_search_q(metadata, search):
+    q = Q()
+    for field_path in metadata.search_field_paths:
+        q |= Q(**{f'{field_path}__icontains': search})
+    return q
+
+
+def filter_queryset(queryset, metadata, filters=None, search=None):
+    q = Q()
+    for column_filter in filters or []:
+        q &= get_column_filter_q(metadata, column_filter)
+    if search and uses_full_text_search(metadata.model, queryset.db):
+        queryset = search_queryset(queryset, search)
+    elif search:
+        q &= get_search_q(metadata, search)
+    return queryset.filter(q)
+
+
+def get_selected_columns(metadata, field_paths=None):
+    """
+    The columns for the given field paths, in the order given,
+    or every column when no field paths are given.
+
+    These include the aggregated columns, which cannot be filtered
+    or ordered on.
+    """
+    all_columns = metadata.columns + metadata.aggregate_columns
+    if field_paths is None:
+        return all_columns
+    columns = {column["field"]: column for column in all_columns}
+    for field_path in field_paths:
+        if field_path not in columns:
+            get_field(metadata, field_path)
+    return [columns[field_path] for field_path in field_paths]
+
+
+def get_ordering(metadata, order_by=None, ranked=False):
+    """
+    The primary key is always the last part of the ordering so that the
+    ordering is unique, which the keyset pagination relies on.
+
+    ranked orders by the rank of the full text search first, best first.
+    """
+    ordering = [(SEARCH_RANK, True)] if ranked else []
+    for column_order in order_by or []:
+        get_field(metadata, column_order.field)
+        ordering.append((column_order.field, column_order.direction == SortDirection.DESC))
+    ordering.append(("pk", bool(ordering) and ordering[-1][1]))
+    return ordering
@@ -0,0 +1,100 @@
+import base64
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.db import models
+from django.utils.duration import duration_iso_string
+from django.utils.encoding import force_str
+
+from adapt.instrumentation import current_format_stats
+
+
+'''
+
+Turning the values of the table query into json.
+
+Each column gets a formatter, worked out once from the type of its django
+field when the registry is built.  Values which json can already represent
+(ints, floats, bools, strings) are left alone, so for most columns there is
+nothing to do.  The rest become strings - dates and times in ISO 8601,
+decimals as written so no precision is lost.  None is always left as None.
+
+A page is at most ADAPT_MAX_TABLE_CELLS cells, so a wide table gets fewer rows
+per page rather than a bigger response.
+
+'''
+
+
+MAX_TABLE_CELLS = getattr(settings, "ADAPT_MAX_TABLE_CELLS", 10000)
+
+
+def format_binary(value):
+    return base64.b64encode(value).decode()
+
+
+# django model field -> (the type the client sees, the formatter)
+# a formatter of None means the value is sent as it is
+MODEL_FIELD_TYPE_MAP = {
+    models.BooleanField: ("boolean", None),
+    models.IntegerField: ("integer", None),
+    models.FloatField: ("float", None),
+    models.DecimalField: ("decimal", str),
+    models.CharField: ("string", None),
+    models.TextField: ("string", None),
+    models.DateTimeField: ("datetime", lambda value: value.isoformat()),
+    models.DateField: ("date", lambda value: value.isoformat()),
+    models.TimeField: ("time", lambda value: value.isoformat()),
+    models.DurationField: ("duration", duration_iso_string),
+    models.UUIDField: ("uuid", str),
+    models.JSONField: ("json", None),
+    models.BinaryField: ("binary", format_binary),
+}
+
+DEFAULT_FIELD_TYPE = ("string", force_str)
+
+
+@dataclass(frozen=True)
+class ColumnFormatter:
+    type: str
+    format: Optional[Callable[[Any], Any]]
+
+
+# the count and labels of an aggregated column, see adapt.aggregates
+AGGREGATE_FORMATTER = ColumnFormatter("aggregate", None)
+
+
+def get_column_formatter(field):
+    # the most specific match wins e.g. DateTimeField rather than DateField
+    for field_class in type(field).__mro__:
+        if field_class in MODEL_FIELD_TYPE_MAP:
+            return ColumnFormatter(*MODEL_FIELD_TYPE_MAP[field_class])
+    return ColumnFormatter(*DEFAULT_FIELD_TYPE)
+
+
+def get_max_rows(number_of_columns):
+    return max(1, MAX_TABLE_CELLS // max(1, number_of_columns))
+
+
+def format_rows(formatters, rows):
+    """
+    rows are tuples of values, in the order of formatters.  Returns a list
+    of formatted values for each row.
+    """
+    started = time.perf_counter()
+    to_format = [
+        (index, formatter.format)
+        for index, formatter in enumerate(formatters)
+        if formatter.format is not None
+    ]
+    formatted_rows = []
+    for row in rows:
+        row = list(row)
+        for index, format in to_format:
+            if (value := row[index]) is not None:
+                row[index] = format(value)
+        formatted_rows.append(row)
+    if (stats := current_format_stats.get()) is not None:
+        stats.add(len(formatted_rows), len(formatted_rows) * len(formatters), time.perf_counter() - started)
+    return formatted_rows
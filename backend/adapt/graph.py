@@ -0,0 +1,193 @@
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db.models import Field
+
+
+'''
+
+Walking the relations between models.
+
+The columns of a model are its own fields followed by the columns of every
+model it has a (forward, not many to many) relation to, e.g. Person has
+address__post_code and work__address__post_code.  A model is never joined to
+twice along the same path, which stops Person.spouse going round forever, and
+the number of joins along a path can be limited with -
+
+    ADAPT_MAX_JOIN_DEPTH = 2
+    ADAPT_MAX_JOIN_DEPTHS = {"dummy.Person": 1}
+
+where the second setting, keyed by model label, overrides the first.  No limit
+is the default.
+
+The walk is iterative rather than recursive and the columns found below each
+model are remembered, so a model reached along several paths (e.g. Address,
+from Person.address and Person.work.address) is only walked once.  What is
+below a model only depends on its remaining depth and which of the models on
+the path so far it could reach again, so that is what it is remembered by.
+
+'''
+
+
+def get_related_field_name(related_field):
+    try:
+        # Special case here
+        # This is for a One to One relation
+        return related_field.field.name
+    except AttributeError:
+        # This is for anything other than One to One
+        return related_field.name
+
+
+def is_column_relation(field):
+    """
+    The relations which are joined to for columns
+    """
+    return bool(field.related_model) and isinstance(field, Field) and not field.many_to_many
+
+
+def get_relation_fields(model):
+    """
+    Every forward relation of the model, many to many included
+    """
+    return [
+        field
+        for field in model._meta.get_fields()
+        if field.related_model and isinstance(field, Field)
+    ]
+
+
+def get_related_models(models):
+    """
+    The models, then every model reachable from them through forward
+    relations, breadth first
+    """
+    seen = dict.fromkeys(models)
+    queue = deque(seen)
+    while queue:
+        for field in get_relation_fields(queue.popleft()):
+            if field.related_model not in seen:
+                seen[field.related_model] = None
+                queue.append(field.related_model)
+    return list(seen)
+
+
+class ModelGraph:
+
+    def __init__(self, max_depth=None, max_depths=None):
+        self.max_depth = max_depth
+        self.max_depths = dict(max_depths or {})
+        # (model, remaining depth, ancestors) -> the columns below the model
+        self._subgraphs = {}
+        # model -> the models reachable through column relations
+        self._reachable = {}
+        self._lock = threading.Lock()
+
+    def get_max_depth(self, model):
+        return self.max_depths.get(model._meta.label, self.max_depth)
+
+    def clear(self):
+        with self._lock:
+            self._subgraphs.clear()
+            self._reachable.clear()
+
+    def _get_reachable(self, model):
+        if (reachable := self._reachable.get(model)) is None:
+            reachable = set()
+            stack = [model]
+            while stack:
+                for field in stack.pop()._meta.get_fields():
+                    if is_column_relation(field) and field.related_model not in reachable:
+                        reachable.add(field.related_model)
+                        stack.append(field.related_model)
+            reachable = self._reachable[model] = frozenset(reachable)
+        return reachable
+
+    def _get_key(self, model, depth, ancestors):
+        # ancestors which cannot be reached from the model make no difference
+        return (model, depth, frozenset(ancestors) & self._get_reachable(model))
+
+    def _get_children(self, key):
+        """
+        (field, key of the related model) for each relation followed from key
+        """
+        model, depth, ancestors = key
+        if depth == 0:
+            return []
+        return [
+            (field, self._get_key(
+                field.related_model,
+                None if depth is None else depth - 1,
+                ancestors | {field.related_model},
+            ))
+            for field in model._meta.get_fields()
+            if is_column_relation(field) and field.related_model not in ancestors
+        ]
+
+    def _walk(self, root):
+        """
+        Works out the columns below root, and below every key under it,
+        children first.
+        """
+        stack = [root]
+        while stack:
+            key = stack[-1]
+            if key in self._subgraphs:
+                stack.pop()
+                continue
+            children = self._get_children(key)
+            missing = [child for _, child in children if child not in self._subgraphs]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            self._subgraphs[key] = self._get_columns_below(key, dict(children))
+
+    def _get_columns_below(self, key, children):
+        """
+        The columns as (path, field name, model name, related model names)
+        tuples, the path and related models relative to key's model
+        """
+        model = key[0]
+        columns = []
+        for field in model._meta.get_fields():
+            if field in children:
+                relation = get_related_field_name(field)
+                related_model_name = field.related_model.__name__
+                columns.extend(
+                    ((relation, *path), name, model_name, (related_model_name, *related_models))
+                    for path, name, model_name, related_models in self._subgraphs[children[field]]
+                )
+            elif not field.related_model:
+                columns.append(((), field.name, model.__name__, ()))
+        return tuple(columns)
+
+    def get_columns(self, model, related_models=(), path=(), max_depth=None):
+        """
+        The column dicts for model.  related_models and path are those of a
+        model the walk starts part way through.
+        """
+        if max_depth is None:
+            max_depth = self.get_max_depth(model)
+        key = self._get_key(model, max_depth, related_models)
+        with self._lock:
+            self._walk(key)
+            columns = self._subgraphs[key]
+        path = list(path)
+        related_models = [related_model.__name__ for related_model in related_models]
+        return [
+            {
+                "name": name,
+                "model": model_name,
+                "field": "__".join(path + [*column_path, name]),
+                "related_models": related_models + list(column_related_models),
+            }
+            for column_path, name, model_name, column_related_models in columns
+        ]
+
+
+model_graph = ModelGraph(
+    max_depth=getattr(settings, "ADAPT_MAX_JOIN_DEPTH", None),
+    max_depths=getattr(settings, "ADAPT_MAX_JOIN_DEPTHS", None),
+)
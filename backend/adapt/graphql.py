@@ -1,36 +1,44 @@
-from dataclasses import make_dataclass, field
+from dataclasses import dataclass, make_dataclass, field
+from functools import lru_cache
 import json
-import string
+import threading
 from strawberry.tools import create_type
 import strawberry
 from typing import List
 from enum import Enum
 from strawberry_django_plus.optimizer import DjangoOptimizerExtension
-import re
+import base64
+from django.conf import settings
 from django.db.models import Field
 from django import forms
 import uuid
 import decimal
 import datetime
-from typing import Optional
+from typing import Any, Optional
 from strawberry import auto
+from strawberry.scalars import JSON
 from strawberry_django_plus import gql
-from adapt.models import Adapt
-from dummy import models as dummy_models
+from adapt.aggregates import RowReader
+from adapt.choices import create_choices_field, get_choice_fields
+from adapt.columnar import encode_table
+from adapt.complexity import QueryCostExtension
+from adapt.counts import TotalCount, get_total_count
+from adapt.documents import DocumentCacheExtension
+from adapt.filters import ColumnFilter, OrderBy, filter_queryset, get_ordering, get_selected_columns
+from adapt.formatters import format_rows, get_max_rows
+from adapt.graph import get_related_models, model_graph
+from adapt.grouping import AggregateResult, Measure, build_aggregate
+from adapt.instrumentation import ResolverProfilerExtension, SQLCounterExtension
+from adapt.mutations import bulk_save_forms, save_form
+from adapt.pages import Page, page_cache
+from adapt.pagination import DEFAULT_PAGE_SIZE, PageInfo, paginate
+from adapt.registry import ModelRegistry
+from adapt.search import is_ranked, rank_queryset
+from adapt.state import StateConflict, read_state, write_state
+from adapt.threads import run_in_db_thread
 import stringcase
 
 
-'''
-
-Limitations -
-
-All forms must be able to work when instantiated without any args or kwargs.
-This is because we get all form fields by calling the constructor without passing anything
-(Unlike django models I can't see anything in the django api for getting form fields)
-
-'''
-
-
 FORM_FIELD_TYPE_MAP = {
     forms.fields.BooleanField: bool,
     forms.fields.CharField: str,
@@ -52,29 +60,57 @@ FORM_FIELD_TYPE_MAP = {
     forms.models.ModelMultipleChoiceField: List[strawberry.ID]
 }
 
-def get_form_fields(form_instance):
-    return form_instance.base_fields.items()
+CHOICE_FIELD_TYPES = (forms.TypedChoiceField, forms.ModelChoiceField, forms.ModelMultipleChoiceField)
+
+@dataclass(frozen=True)
+class FormFieldMetadata:
+    name: str
+    field_type: type
+    # the python type of the field in the generated input type
+    input_type: Any
+    required: bool
+    is_choice: bool
+
+def get_form_fields(form_class):
+    """
+    The declared fields of the form, which means the form
+    does not have to be instantiated
+    """
+    return form_class.base_fields.items()
+
+@lru_cache(maxsize=None)
+def get_form_metadata(form_class):
+    """
+    Worked out once per form class.  Call get_form_metadata.cache_clear()
+    if the forms change.
+    """
+    return tuple(
+        FormFieldMetadata(
+            name=field_name,
+            field_type=type(form_field),
+            input_type=FORM_FIELD_TYPE_MAP[type(form_field)],
+            required=form_field.required,
+            is_choice=isinstance(form_field, CHOICE_FIELD_TYPES),
+        )
+        for field_name, form_field in get_form_fields(form_class)
+    )
 
 def get_all_fields_from_form(form_class):
-    form_instance = form_class()
     fields = []
-    items = get_form_fields(form_instance)
     # push optional items to the end of the list.
     # we will assign them "None" value, so they should be placed after
     # attrs with no default values
-    sorted_items = sorted(items, key=lambda x: x[1].required, reverse=True)
+    sorted_items = sorted(get_form_metadata(form_class), key=lambda x: x.required, reverse=True)
     for item in sorted_items:
-        item_name = item[0]
-        item_value = item[1]
-        field_tuple = (item_name, )
+        field_tuple = (item.name, )
         # set default value to None for Optional types
-        if not item_value.required:
+        if not item.required:
             field_tuple = field_tuple + (
-                Optional[FORM_FIELD_TYPE_MAP[type(item_value)]],
+                Optional[item.input_type],
                 field(default=None),)
         else:
             field_tuple = field_tuple + (
-                FORM_FIELD_TYPE_MAP[type(item_value)],)
+                item.input_type,)
         fields.append(field_tuple)
 
     # ModelForm instances should have id attr even if it's not present
@@ -124,7 +160,12 @@ def create_default_model_form(model):
     meta_cls = type("Meta", (), {"model": model, "fields": "__all__"})
     return type(f'Default{model.__name__}', (forms.ModelForm,), {"Meta": meta_cls})
 
-def get_mutation_field_from_model(model, model_gql, form):
+@strawberry.type
+class BulkErrorType:
+    index: int
+    errors: List[ErrorType]
+
+def get_form_input(model, form):
 
     form_input_name = f'default_{model.__name__}_input'
 
@@ -134,7 +175,9 @@ def get_mutation_field_from_model(model, model_gql, form):
     )
     FormInputDataclass.__doc__ = None
 
-    FormInput = strawberry.input(FormInputDataclass)
+    return strawberry.input(FormInputDataclass)
+
+def get_mutation_field_from_model(model, model_gql, form, FormInput):
 
     form_response_name = f'default_{model.__name__}_response'
 
@@ -150,17 +193,56 @@ def get_mutation_field_from_model(model, model_gql, form):
 
     FormResponse = strawberry.type(FormResponseDataclass)
 
-    def resolver(info, input: FormInput) -> FormResponse:
-        return FormResponse()
+    async def resolver(info, input: FormInput) -> FormResponse:
+        instance, errors = await run_in_db_thread(save_form, form, input)
+        return FormResponse(
+            response=instance,
+            errors=ErrorType.from_errors(errors) if errors else None,
+        )
+
+    # create_type names the fields after their resolvers
+    resolver.__name__ = f'{model.__name__.lower()}_default'
+
+    return strawberry.mutation(name=resolver.__name__, resolver=resolver)
+
+def get_bulk_mutation_field_from_model(model, model_gql, form, FormInput):
 
-    return strawberry.mutation(name=f'{model.__name__.lower()}_default', resolver=resolver)
+    form_response_name = f'default_{model.__name__}_bulk_response'
+
+    FormResponseDataclass = make_dataclass(
+            form_response_name,
+            fields=[
+                ("response", Optional[List[model_gql]]),
+                ("errors", Optional[List[BulkErrorType]]),
+            ],
+        )
+
+    FormResponseDataclass.__doc__ = None
+
+    FormResponse = strawberry.type(FormResponseDataclass)
+
+    async def resolver(info, input: List[FormInput]) -> FormResponse:
+        """
+        Either every input is saved, or none are and the errors
+        for each invalid input are returned.
+        """
+        instances, errors = await run_in_db_thread(bulk_save_forms, form, input)
+        return FormResponse(
+            response=instances,
+            errors=[
+                BulkErrorType(index=index, errors=ErrorType.from_errors(form_errors))
+                for index, form_errors in errors
+            ] if errors else None,
+        )
+
+    # create_type names the fields after their resolvers
+    resolver.__name__ = f'{model.__name__.lower()}_default_bulk'
+
+    return strawberry.mutation(name=resolver.__name__, resolver=resolver)
 
 
 def create_choices_field_from_forms(forms):
-    # TODO - dynamically create a object type
-    # where we resolve the fields on the object
-    # See - https://strawberry.rocks/docs/types/resolvers#accessing-fields-parents-data
-    return None
+    return create_choices_field(get_choice_fields(forms))
 
 
 @strawberry.type
@@ -169,40 +251,150 @@ class Column:
     model: str
     field: str
     related_models: List[str]
+    # how the values are formatted e.g. "integer", "date", see adapt.formatters
+    type: str
 
 @strawberry.type
 class Row:
     cursor: str
-    cellValues: List[str]
+    # typed, null for null
+    values: List[Optional[JSON]]
+
+    @strawberry.field
+    def cellValues(self) -> List[str]:
+        """
+        The values as text, with an empty string for null.  See values for
+        which are null.
+        """
+        return [
+            "" if value is None else json.dumps(value) if isinstance(value, dict) else str(value)
+            for value in self.values
+        ]
+
+
+@strawberry.type
+class ColumnarColumn:
+    field: str
+    type: str
+    # base64, bit i (least significant first) is set when row i is null
+    nulls: Optional[str]
+    # when set the values are indexes into it
+    dictionary: Optional[List[str]]
+    # the values which are not null
+    values: JSON
+
+
+@strawberry.type
+class ColumnarTable:
+    """
+    The page as one array per column, see adapt.columnar
+    """
+    length: int
+    columns: List[ColumnarColumn]
 
 
 @strawberry.type
 class Table:
     columns: List["Column"]
-    rows: List["Row"]
+    page_info: PageInfo
+    cursors: strawberry.Private[List[str]] = None
+    # the formatted values of each row
+    values: strawberry.Private[List[list]] = None
+    # the filtered rows, before they are paginated
+    queryset: strawberry.Private[Any] = None
+
+    @strawberry.field
+    def rows(self) -> List[Row]:
+        return [
+            Row(cursor=cursor, values=values)
+            for cursor, values in zip(self.cursors, self.values)
+        ]
+
+    @strawberry.field
+    def columnar(self) -> ColumnarTable:
+        table = encode_table(
+            [column.field for column in self.columns],
+            [column.type for column in self.columns],
+            self.values,
+        )
+        return ColumnarTable(
+            length=table["length"],
+            columns=[
+                ColumnarColumn(
+                    **{**column, "nulls": column["nulls"] and base64.b64encode(column["nulls"]).decode()}
+                )
+                for column in table["columns"]
+            ],
+        )
+
+    @strawberry.field
+    async def total_count(self) -> TotalCount:
+        """
+        Only exact below ADAPT_EXACT_COUNT_THRESHOLD rows, see adapt.counts
+        """
+        return await run_in_db_thread(get_total_count, self.queryset)
+
+@strawberry.type
+class FormField:
+    name: str
+    field_type: str
+    required: bool
+    is_choice: bool
 
 @strawberry.type
 class Form:
     mutation_name: str
     choice_fields: List[str]
+    fields: List[FormField]
+
+def get_form(mutation_name, form):
+    return Form(
+        mutation_name=mutation_name,
+        choice_fields=get_choice_fields_from_form(form),
+        fields=[
+            FormField(
+                name=item.name,
+                field_type=item.field_type.__name__,
+                required=item.required,
+                is_choice=item.is_choice,
+            )
+            for item in get_form_metadata(form)
+        ],
+    )
 
 
 @strawberry.type
 class SaveStateResponse:
     success: bool
+    version: int
     # TODO (probably)- add errors
 
-DEFAULT_STATE = { 'devtoolsPosition': 'right', 'elements': [], 'elementInView': None }
+@strawberry.type
+class State:
+    version: int
+    modified: bool
+    # null when not modified
+    state: Optional[str]
 
-def get_state() -> str:
-    adapt = Adapt.objects.last()
-    if adapt:
-        return adapt.state
-    return json.dumps(DEFAULT_STATE)
+async def get_state(version: Optional[int] = None) -> State:
+    """
+    If the client already has the state at version, and it is still the
+    current version, the state is not sent again.
+    """
+    state, current_version = await run_in_db_thread(read_state, version)
+    return State(version=current_version, modified=state is not None, state=state)
 
-def save_state(state: str) -> SaveStateResponse:
-    Adapt.objects.create(state=state)
-    return SaveStateResponse(success=True)
+async def save_state(state: str, version: Optional[int] = None, durable: bool = False) -> SaveStateResponse:
+    """
+    Saves are buffered and written in the background unless durable is true,
+    in which case the state has been written to the database by the time
+    this returns.
+    """
+    try:
+        version = await run_in_db_thread(write_state, state, version, durable=durable)
+    except StateConflict as conflict:
+        return SaveStateResponse(success=False, version=conflict.version)
+    return SaveStateResponse(success=True, version=version)
 
 
 def is_many_to_one_relation(model):
@@ -218,60 +410,31 @@ def is_many_to_one_relation(model):
         return False
 
 
-def get_related_field_name(related_field):
-    try:
-        # Special case here
-        # This is for a One to One relation
-        return related_field.field.name
-    except AttributeError:
-        # This is for anything other than One to One
-        return related_field.name
-
-
-def get_columns_from_django_model(model, related_models, path):
-    columns = []
-
-    fields = model._meta.get_fields()
-
-    for field in fields:
-        if related_model := field.related_model:
-            if (
-                isinstance(field, Field)
-                and not field.many_to_many
-                and related_model not in related_models
-            ):
-                columns = columns + get_columns_from_django_model(
-                    related_model,
-                    related_models=related_models + [related_model],
-                    path=path + [get_related_field_name(field)]
-                )
-        else:
-            column = {
-                "name": field.name,
-                "model": model.__name__,
-                "field": "__".join(path + [field.name]),
-                "related_models": [ related_model.__name__ for related_model in related_models]
-            }
-            columns.append(column)
-
-    return columns
+def get_columns_from_django_model(model, related_models=(), path=(), max_depth=None):
+    """
+    See adapt.graph
+    """
+    return model_graph.get_columns(model, related_models, path, max_depth=max_depth)
 
 def get_model_gql_types(models, model_types):
 
-    for model in models:
+    # every model the types refer to needs a type of its own
+    related_models = [
+        model
+        for model in get_related_models(models)
+        if model.__name__ not in model_types
+    ]
+
+    for model in related_models:
         model_type_name = f'{model.__name__}Type'
         model_type = gql.django.type(model)
-        model_gql_type = model_type(make_dataclass(model_type_name, [("id", str)]))
-        model_types[model.__name__] = model_gql_type
+        model_types[model.__name__] = model_type(make_dataclass(model_type_name, [("id", str)]))
 
+    for model in related_models:
+        model_gql_type = model_types[model.__name__]
         for field in model._meta.get_fields():
             if field.related_model and isinstance(field, Field):
-                related_model = field.related_model
-                if related_model.__name__ in model_types:
-                    ...
-                else:
-                    get_model_gql_types([related_model], model_types)
-                setattr(model_gql_type, field.name, model_types[related_model.__name__])
+                setattr(model_gql_type, field.name, model_types[field.related_model.__name__])
             else:
                 setattr(model_gql_type, field.name, auto)
 
@@ -279,14 +442,87 @@ def get_model_gql_types(models, model_types):
 
 
 def get_choice_fields_from_form(form):
-    choices = []
-    form_instance = form()
-    for field_name, field in get_form_fields(form_instance):
-        if isinstance(field, (forms.TypedChoiceField, forms.ModelChoiceField, forms.ModelMultipleChoiceField)):
-            choices.append(field_name)
-    return choices
+    return [item.name for item in get_form_metadata(form) if item.is_choice]
+
+def read_page(metadata, columns, queryset, ordering, first, after, last, before):
+    reader = RowReader(columns, metadata.aggregates)
+    rows, page_info = paginate(
+        reader.annotate(queryset),
+        reader.value_fields,
+        ordering=ordering,
+        first=first,
+        after=after,
+        last=last,
+        before=before,
+    )
+    formatters = [metadata.formatters[column["field"]] for column in columns]
+    return Page(
+        cursors=[cursor for cursor, _ in rows],
+        values=format_rows(formatters, reader.read([obj for _, obj in rows])),
+        page_info=page_info,
+    )
 
-def register(django_models):
+def build_table(
+    metadata,
+    first=None,
+    after=None,
+    last=None,
+    before=None,
+    filters=None,
+    order_by=None,
+    search=None,
+    columns=None,
+    cache=page_cache,
+):
+    # only the requested columns are selected, so only their relations are joined
+    columns = get_selected_columns(metadata, columns)
+
+    queryset = filter_queryset(
+        metadata.model.objects.all(),
+        metadata,
+        filters=filters,
+        search=search,
+    )
+
+    # a wide table gets fewer rows, so the cost of a page is bounded
+    max_rows = get_max_rows(len(columns))
+    if last is not None:
+        last = min(last, max_rows)
+    else:
+        first = min(first, max_rows) if first is not None else min(DEFAULT_PAGE_SIZE, max_rows)
+
+    # the full text search results are the best first, unless ordered otherwise
+    ranked = is_ranked(queryset, search, order_by)
+    ordering = get_ordering(metadata, order_by, ranked=ranked)
+    page_queryset = rank_queryset(queryset, search) if ranked else queryset
+    build = lambda: read_page(metadata, columns, page_queryset, ordering, first, after, last, before)
+    if cache is None:
+        page = build()
+    else:
+        arguments = {
+            "columns": [column["field"] for column in columns],
+            "filters": filters,
+            "search": search,
+            "ordering": ordering,
+            "first": first,
+            "after": after,
+            "last": last,
+            "before": before,
+        }
+        page = cache.get_or_build(metadata, arguments, build)
+
+    return Table(
+        columns=[
+            Column(**column, type=metadata.formatters[column["field"]].type)
+            for column in columns
+        ],
+        cursors=page.cursors,
+        values=page.values,
+        page_info=page.page_info,
+        queryset=queryset,
+    )
+
+def build_schema(django_models):
 
     django_model_enums = Enum(
         "django_models", dict([(stringcase.snakecase(django_model.__name__), django_model.__name__) for django_model in django_models])
@@ -294,6 +530,11 @@ def register(django_models):
 
     strawberry.enum(django_model_enums)
 
+    # all the introspection of the models is done up front
+    registry = ModelRegistry(django_models).build()
+    for model in registry:
+        page_cache.watch(registry.get(model))
+
     '''
     TODO -
     Introduce a perms system for particular models
@@ -306,40 +547,64 @@ def register(django_models):
             for enum in django_model_enums
         ]
 
-    def get_table(model: django_model_enums) -> Table:
-
-        for django_model in django_models:
-            if django_model.__name__ == model:
-                break
-
-        columns = get_columns_from_django_model(django_model, [], [])
-
-        objs = django_model.objects.all().values_list(*[column["field"] for column in columns])
+    async def get_table(
+        model: django_model_enums,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        last: Optional[int] = None,
+        before: Optional[str] = None,
+        filters: Optional[List[ColumnFilter]] = None,
+        order_by: Optional[List[OrderBy]] = None,
+        search: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Table:
+        return await run_in_db_thread(
+            build_table,
+            registry.get(model.value),
+            first=first,
+            after=after,
+            last=last,
+            before=before,
+            filters=filters,
+            order_by=order_by,
+            search=search,
+            columns=columns,
+        )
 
-        return Table(
-            columns=[Column(**column) for column in columns],
-            rows=[
-                Row(**{
-                    "cursor": "todo",
-                    "cellValues": [str(value) for value in obj ]
-                })
-                for obj in objs
-            ]
+    async def get_aggregate(
+        model: django_model_enums,
+        group_by: Optional[List[str]] = None,
+        measures: Optional[List[Measure]] = None,
+        filters: Optional[List[ColumnFilter]] = None,
+        search: Optional[str] = None,
+        first: Optional[int] = None,
+    ) -> AggregateResult:
+        return await run_in_db_thread(
+            build_aggregate,
+            registry.get(model.value),
+            group_by=group_by,
+            measures=measures,
+            filters=filters,
+            search=search,
+            first=first,
         )
 
     models = strawberry.field(name="models", resolver=get_models)
     table = strawberry.field(name="table", resolver=get_table)
+    aggregate = strawberry.field(name="aggregate", resolver=get_aggregate)
 
     model_types = get_model_gql_types(django_models, {})
 
     default_django_model_form_fields = []
     forms = []
-    for_choices_query = []
     for model in django_models:
         default_model_form = create_default_model_form(model)
-        mutation_field = get_mutation_field_from_model(model, model_types[model.__name__], default_model_form)
+        form_input = get_form_input(model, default_model_form)
+        mutation_field = get_mutation_field_from_model(model, model_types[model.__name__], default_model_form, form_input)
+        bulk_mutation_field = get_bulk_mutation_field_from_model(model, model_types[model.__name__], default_model_form, form_input)
         forms.append((mutation_field.graphql_name, default_model_form))
         default_django_model_form_fields.append(mutation_field)
+        default_django_model_form_fields.append(bulk_mutation_field)
 
     save_state_mutation = strawberry.mutation(name='saveState', resolver=save_state)
 
@@ -353,23 +618,96 @@ def register(django_models):
 
     choices_field = create_choices_field_from_forms(forms)
 
+    # these never change so are worked out once
+    all_forms = [get_form(mutation_name, form) for mutation_name, form in forms]
+
     def get_forms() -> List[Form]:
-        return [
-            Form(mutation_name=mutation_name, choice_fields=get_choice_fields_from_form(form))
-            for mutation_name, form in forms
-        ]
+        return all_forms
 
     forms_field = strawberry.field(name="forms", resolver=get_forms)
     state = strawberry.field(name="state", resolver=get_state)
 
-    # TODO - add choices field
-    Query = create_type("Query", [forms_field, models, state, table])
+    Query = create_type("Query", [aggregate, choices_field, forms_field, models, state, table])
+
+    extensions = [DocumentCacheExtension, QueryCostExtension, DjangoOptimizerExtension]
+    if settings.DEBUG:
+        extensions.append(SQLCounterExtension)
+    if getattr(settings, "ADAPT_PROFILE_RESOLVERS", False):
+        extensions.append(ResolverProfilerExtension)
 
     return {
         "query": Query,
+        "registry": registry,
         "schema": strawberry.Schema(
-            extensions=[DjangoOptimizerExtension],
+            extensions=extensions,
             query=Query,
             mutation=Mutation
         )
     }
+
+
+class LazySchema:
+    """
+    Stands in for the strawberry.Schema, building it when first used.
+    """
+
+    def __init__(self, registration):
+        self._registration = registration
+
+    def __getattr__(self, name):
+        return getattr(self._registration.build()["schema"], name)
+
+
+class Registration:
+    """
+    What register returns.
+
+    Building the schema means walking every model and creating types and
+    forms for them, which we do not want to do while the worker is starting.
+    So it is built the first time it is needed -
+
+        registration["schema"] is a LazySchema, so does not build the schema
+        registration["query"] or registration["registry"] do
+
+    Call warm (or warm_schemas) to build it ahead of the first request.
+    """
+
+    def __init__(self, django_models):
+        self.django_models = list(django_models)
+        self.schema = LazySchema(self)
+        self._built = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_built(self):
+        return self._built is not None
+
+    def build(self):
+        if self._built is None:
+            with self._lock:
+                if self._built is None:
+                    self._built = build_schema(self.django_models)
+        return self._built
+
+    def warm(self):
+        self.build()
+        return self
+
+    def __getitem__(self, key):
+        if key == "schema":
+            return self.schema
+        return self.build()[key]
+
+
+registrations = []
+
+
+def register(django_models):
+    registration = Registration(django_models)
+    registrations.append(registration)
+    return registration
+
+
+def warm_schemas():
+    for registration in registrations:
+        registration.warm()
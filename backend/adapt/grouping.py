@@ -0,0 +1,183 @@
+from enum import Enum
+from typing import List, Optional
+
+import strawberry
+from django.conf import settings
+from django.db.models import Avg, BigIntegerField, Count, FloatField, Max, Min, Sum
+from strawberry.scalars import JSON
+
+from adapt.filters import FilterError, filter_queryset, get_field
+from adapt.formatters import ColumnFormatter, format_rows
+from adapt.pagination import DEFAULT_PAGE_SIZE
+
+
+'''
+
+The aggregate query - counts, sums, averages and so on of the columns of a
+model, grouped by other columns, e.g. the number of people and their oldest
+age for each post code -
+
+    aggregate(
+        model: person,
+        groupBy: ["address__post_code"],
+        measures: [{function: COUNT}, {function: MAX, field: "age"}],
+        filters: [{field: "gender", eq: "f"}],
+    ) { columns { name type } rows truncated }
+
+which is one SELECT ... GROUP BY, so only the groups leave the database.
+Any column of the table can be grouped by or measured, and the filters and
+search are those of the table query.  Each row is the values of the group by
+columns then the measures, formatted like the table's values.
+
+The groups are ordered by the group by columns.  There are first of them
+(DEFAULT_PAGE_SIZE unless given) up to ADAPT_MAX_AGGREGATE_GROUPS, and
+truncated says whether there were more.
+
+'''
+
+
+MAX_AGGREGATE_GROUPS = getattr(settings, "ADAPT_MAX_AGGREGATE_GROUPS", 1000)
+
+NUMBER_TYPES = {"integer", "float", "decimal"}
+# the types the database can order, so find the min and max of
+ORDERED_TYPES = NUMBER_TYPES | {"string", "date", "datetime", "time", "duration"}
+
+
+@strawberry.enum
+class AggregateFunction(Enum):
+    COUNT = "count"
+    COUNT_DISTINCT = "count_distinct"
+    SUM = "sum"
+    AVG = "avg"
+    MIN = "min"
+    MAX = "max"
+
+
+@strawberry.input
+class Measure:
+    function: AggregateFunction
+    # only COUNT can leave this out, to count the rows
+    field: Optional[str] = None
+
+
+@strawberry.type
+class AggregateColumn:
+    name: str
+    # see adapt.formatters
+    type: str
+
+
+@strawberry.type
+class AggregateResult:
+    columns: List[AggregateColumn]
+    # the values of the group by columns then the measures
+    rows: List[List[Optional[JSON]]]
+    # true if there were more than the groups returned
+    truncated: bool
+
+
+# function -> (django aggregate, the types it takes)
+FUNCTIONS = {
+    AggregateFunction.COUNT: (Count, None),
+    AggregateFunction.COUNT_DISTINCT: (lambda field_path: Count(field_path, distinct=True), None),
+    AggregateFunction.SUM: (Sum, NUMBER_TYPES),
+    AggregateFunction.AVG: (Avg, NUMBER_TYPES),
+    AggregateFunction.MIN: (Min, ORDERED_TYPES),
+    AggregateFunction.MAX: (Max, ORDERED_TYPES),
+}
+
+COUNT_FUNCTIONS = {AggregateFunction.COUNT, AggregateFunction.COUNT_DISTINCT}
+
+COUNT_FORMATTER = ColumnFormatter("integer", None)
+# the average of integers is not an integer
+AVG_FORMATTER = ColumnFormatter("float", None)
+
+# column type -> the field the sum, min and max of the column are read as.
+# Otherwise e.g. the sum of a bigint, which Postgres returns as a numeric,
+# comes back as a Decimal
+OUTPUT_FIELDS = {
+    "integer": BigIntegerField,
+    "float": FloatField,
+}
+
+
+def get_measure_name(measure):
+    if measure.field is None:
+        return measure.function.value
+    return f'{measure.function.value}({measure.field})'
+
+
+def get_measure(metadata, measure):
+    """
+    (django aggregate, ColumnFormatter for its values) for measure
+    """
+    function, types = FUNCTIONS[measure.function]
+    if measure.field is None:
+        if measure.function != AggregateFunction.COUNT:
+            raise FilterError(f'{measure.function.name} needs a field')
+        return Count("pk"), COUNT_FORMATTER
+
+    get_field(metadata, measure.field)
+    formatter = metadata.formatters[measure.field]
+    if types is not None and formatter.type not in types:
+        raise FilterError(
+            f'{measure.function.name} is not supported for "{measure.field}", a {formatter.type} column'
+        )
+    if measure.function in COUNT_FUNCTIONS:
+        return function(measure.field), COUNT_FORMATTER
+    if measure.function == AggregateFunction.AVG:
+        return function(measure.field, output_field=FloatField()), AVG_FORMATTER
+    if (output_field := OUTPUT_FIELDS.get(formatter.type)) is not None:
+        return function(measure.field, output_field=output_field()), formatter
+    return function(measure.field), formatter
+
+
+def build_aggregate(metadata, group_by=None, measures=None, filters=None, search=None, first=None):
+    group_by = list(group_by or [])
+    for field_path in group_by:
+        get_field(metadata, field_path)
+    if len(set(group_by)) != len(group_by):
+        raise FilterError("groupBy has the same column more than once")
+    if not measures:
+        measures = [Measure(function=AggregateFunction.COUNT)]
+
+    if first is not None and first < 0:
+        raise FilterError("first must not be negative")
+
+    names = list(group_by)
+    formatters = [metadata.formatters[field_path] for field_path in group_by]
+    annotations = {}
+    for index, measure in enumerate(measures):
+        annotations[f'_measure_{index}'], formatter = get_measure(metadata, measure)
+        names.append(get_measure_name(measure))
+        formatters.append(formatter)
+
+    queryset = filter_queryset(
+        metadata.model.objects.all(),
+        metadata,
+        filters=filters,
+        search=search,
+    )
+
+    limit = min(first if first is not None else DEFAULT_PAGE_SIZE, MAX_AGGREGATE_GROUPS)
+    if group_by:
+        rows = list(
+            queryset.values(*group_by)
+            .annotate(**annotations)
+            .order_by(*group_by)
+            .values_list(*group_by, *annotations)[:limit + 1]
+        )
+    else:
+        # the whole table is one group
+        values = queryset.order_by().aggregate(**annotations)
+        rows = [tuple(values[alias] for alias in annotations)]
+
+    return AggregateResult(
+        columns=[
+            AggregateColumn(name=name, type=formatter.type)
+            for name, formatter in zip(names, formatters)
+        ],
+        rows=format_rows(formatters, rows[:limit]),
+        truncated=len(rows) > limit,
+    )
+
@@ -0,0 +1,320 @@
+import json
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from inspect import isawaitable
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from graphql import get_operation_ast
+from strawberry.extensions import Extension
+
+
+JOIN_RE = re.compile(r'\bJOIN\b', re.IGNORECASE)
+
+# the SQLCounter for the request being resolved, if any
+current_sql_counter = ContextVar("current_sql_counter", default=None)
+# likewise the FormatStats
+current_format_stats = ContextVar("current_format_stats", default=None)
+# and the SQLCounter of the root field being resolved
+current_resolver_sql_counter = ContextVar("current_resolver_sql_counter", default=None)
+
+
+class SQLCounter:
+    """
+    A database execute wrapper which counts the queries run,
+    and the joins in those queries, while it is installed.
+
+    See - https://docs.djangoproject.com/en/4.0/topics/db/instrumentation/
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.joins = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        self.joins += len(JOIN_RE.findall(sql))
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def as_dict(self):
+        return {"queries": self.queries, "joins": self.joins, "ms": round(self.seconds * 1000, 3)}
+
+
+class FormatStats:
+    """
+    How many table rows and cells were formatted (see adapt.formatters)
+    and how long it took.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.cells = 0
+        self.seconds = 0.0
+
+    def add(self, rows, cells, seconds):
+        self.rows += rows
+        self.cells += cells
+        self.seconds += seconds
+
+    def as_dict(self):
+        return {"rows": self.rows, "cells": self.cells, "ms": round(self.seconds * 1000, 3)}
+
+
+@contextmanager
+def count_sql(*counters):
+    """
+    Installs the counters on this thread's connections.
+    """
+    with ExitStack() as stack:
+        for connection in connections.all():
+            for counter in counters:
+                stack.enter_context(connection.execute_wrapper(counter))
+        yield counters
+
+
+def get_sql_counters():
+    """
+    The SQLCounters of the request and root field being resolved, if any
+    """
+    return [
+        counter
+        for counter in (current_sql_counter.get(), current_resolver_sql_counter.get())
+        if counter is not None
+    ]
+
+
+class SQLCounterExtension(Extension):
+    """
+    Adds the number of SQL queries and joins run for the request
+    to the "sql" key of the response extensions, and the table cells
+    formatted to the "formatting" key.
+
+    Queries run in the db threads (see adapt.threads) are counted too.
+    """
+
+    def on_request_start(self):
+        self.counter = SQLCounter()
+        self.format_stats = FormatStats()
+        self.token = current_sql_counter.set(self.counter)
+        self.format_stats_token = current_format_stats.set(self.format_stats)
+        self.stack = ExitStack()
+        self.stack.enter_context(count_sql(self.counter))
+
+    def on_request_end(self):
+        self.stack.close()
+        current_sql_counter.reset(self.token)
+        current_format_stats.reset(self.format_stats_token)
+
+    def get_results(self):
+        return {"sql": self.counter.as_dict(), "formatting": self.format_stats.as_dict()}
+
+
+
+class ResolverProfile:
+
+    def __init__(self, field):
+        self.field = field
+        self.sql = SQLCounter()
+        self.seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+
+    def finish(self, started, result):
+        self.seconds = time.perf_counter() - started
+        self.rows = get_rows(result)
+
+    def as_dict(self):
+        return {
+            "field": self.field,
+            "ms": round(self.seconds * 1000, 3),
+            "sql": self.sql.as_dict(),
+            "rows": self.rows,
+            "bytes": self.bytes,
+        }
+
+
+def get_rows(result):
+    if result is None:
+        return 0
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    # Table.rows is a resolver over Table.values
+    for name in ("rows", "values"):
+        if isinstance(rows := getattr(result, name, None), list):
+            return len(rows)
+    return 1
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                self.bucket_counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class ResolverMetrics:
+
+    # name -> (help, buckets, the value observed)
+    METRICS = {
+        "adapt_resolver_seconds": (
+            "Time taken to resolve the field",
+            (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+            lambda profile: profile.seconds,
+        ),
+        "adapt_resolver_sql_queries": (
+            "SQL queries run to resolve the field",
+            (0, 1, 2, 5, 10, 20, 50, 100),
+            lambda profile: profile.sql.queries,
+        ),
+        "adapt_resolver_sql_seconds": (
+            "Time spent running SQL queries to resolve the field",
+            (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+            lambda profile: profile.sql.seconds,
+        ),
+        "adapt_resolver_rows": (
+            "Rows returned by the field",
+            (0, 1, 10, 50, 100, 500, 1000, 10000),
+            lambda profile: profile.rows,
+        ),
+        "adapt_resolver_bytes": (
+            "Size of the field in the response",
+            (100, 1000, 10000, 100000, 1000000, 10000000),
+            lambda profile: profile.bytes,
+        ),
+    }
+
+    # beyond this many operation names the rest are recorded as "other"
+    MAX_OPERATIONS = 200
+
+    def __init__(self):
+        # (operation name, field) -> metric name -> Histogram
+        self._histograms = {}
+        self._operations = set()
+        self._lock = threading.Lock()
+
+    def observe(self, operation_name, profile):
+        with self._lock:
+            if operation_name not in self._operations:
+                if len(self._operations) >= self.MAX_OPERATIONS:
+                    operation_name = "other"
+                self._operations.add(operation_name)
+            key = (operation_name, profile.field)
+            if (histograms := self._histograms.get(key)) is None:
+                histograms = self._histograms[key] = {
+                    name: Histogram(buckets)
+                    for name, (_, buckets, _) in self.METRICS.items()
+                }
+            for name, (_, _, get_value) in self.METRICS.items():
+                histograms[name].observe(get_value(profile))
+
+    def render(self):
+        """
+        The metrics in the Prometheus text format, see -
+        https://prometheus.io/docs/instrumenting/exposition_formats/
+        """
+        lines = []
+        with self._lock:
+            for name, (help, buckets, _) in self.METRICS.items():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} histogram')
+                for (operation_name, field), histograms in sorted(self._histograms.items()):
+                    histogram = histograms[name]
+                    labels = f'operation="{escape_label(operation_name)}",field="{escape_label(field)}"'
+                    for bucket, count in zip(buckets, histogram.bucket_counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+resolver_metrics = ResolverMetrics()
+
+
+class ResolverProfilerExtension(Extension):
+    """
+    Profiles the root fields of each request (table, state, forms, the
+    mutations) - how long each took, the SQL queries it ran and how long they
+    took, the rows it returned and the size of its part of the response.
+
+    With DEBUG on the profiles are added to the "resolvers" key of the response
+    extensions.  Either way they go into resolver_metrics, which the metrics
+    view serves in the Prometheus text format.  The metrics are per process.
+    """
+
+    def on_request_start(self):
+        # response key -> ResolverProfile, for the root fields
+        self.profiles = {}
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        if info.path.prev is not None:
+            return _next(root, info, *args, **kwargs)
+
+        profile = self.profiles[info.path.key] = ResolverProfile(info.field_name)
+        started = time.perf_counter()
+        token = current_resolver_sql_counter.set(profile.sql)
+        try:
+            # sync resolvers query the database in this thread
+            with count_sql(profile.sql):
+                result = _next(root, info, *args, **kwargs)
+        finally:
+            current_resolver_sql_counter.reset(token)
+
+        if isawaitable(result):
+            return self._resolve_async(profile, started, result)
+        profile.finish(started, result)
+        return result
+
+    async def _resolve_async(self, profile, started, result):
+        # async resolvers query the database in the db threads, see adapt.threads
+        token = current_resolver_sql_counter.set(profile.sql)
+        try:
+            result = await result
+        finally:
+            current_resolver_sql_counter.reset(token)
+        profile.finish(started, result)
+        return result
+
+    def get_operation_name(self):
+        execution_context = self.execution_context
+        if execution_context.operation_name:
+            return execution_context.operation_name
+        operation = get_operation_ast(execution_context.graphql_document)
+        if operation is not None and operation.name is not None:
+            return operation.name.value
+        return "anonymous"
+
+    def on_executing_end(self):
+        result = self.execution_context.result
+        data = (result.data if result is not None else None) or {}
+        operation_name = self.get_operation_name()
+        for key, profile in self.profiles.items():
+            profile.bytes = len(json.dumps(data.get(key), cls=DjangoJSONEncoder).encode())
+            resolver_metrics.observe(operation_name, profile)
+
+    def get_results(self):
+        if not settings.DEBUG:
+            return {}
+        return {"resolvers": {key: profile.as_dict() for key, profile in self.profiles.items()}}
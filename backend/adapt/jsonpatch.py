@@ -0,0 +1,94 @@
+'''
+
+A minimal JSON patch (RFC 6902) implementation for diffing the adapt state.
+
+Only the add, remove and replace operations are produced and understood.
+
+'''
+
+
+def escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def unescape(token):
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(source, target, path=""):
+    """
+    The operations which turn source into target.
+    """
+    if type(source) is not type(target):
+        return [{"op": "replace", "path": path, "value": target}]
+
+    if isinstance(source, dict):
+        operations = []
+        for key in source:
+            if key not in target:
+                operations.append({"op": "remove", "path": f'{path}/{escape(key)}'})
+        for key, value in target.items():
+            if key in source:
+                operations.extend(make_patch(source[key], value, f'{path}/{escape(key)}'))
+            else:
+                operations.append({"op": "add", "path": f'{path}/{escape(key)}', "value": value})
+        return operations
+
+    if isinstance(source, list):
+        operations = []
+        common = min(len(source), len(target))
+        for index in range(common):
+            operations.extend(make_patch(source[index], target[index], f'{path}/{index}'))
+        # remove from the end so the earlier indexes stay valid
+        for index in reversed(range(common, len(source))):
+            operations.append({"op": "remove", "path": f'{path}/{index}'})
+        for index in range(common, len(target)):
+            operations.append({"op": "add", "path": f'{path}/{index}', "value": target[index]})
+        return operations
+
+    if source != target:
+        return [{"op": "replace", "path": path, "value": target}]
+    return []
+
+
+def _split_path(path):
+    if path == "":
+        return []
+    return [unescape(token) for token in path[1:].split("/")]
+
+
+def _get_container(document, tokens):
+    for token in tokens:
+        document = document[int(token) if isinstance(document, list) else token]
+    return document
+
+
+def apply_patch(document, patch):
+    """
+    Applies the patch in place where it can and returns the patched document.
+    """
+    for operation in patch:
+        tokens = _split_path(operation["path"])
+        if not tokens:
+            if operation["op"] == "remove":
+                document = None
+            else:
+                document = operation["value"]
+            continue
+
+        container = _get_container(document, tokens[:-1])
+        key = tokens[-1]
+        if isinstance(container, list):
+            key = len(container) if key == "-" else int(key)
+            if operation["op"] == "add":
+                container.insert(key, operation["value"])
+            elif operation["op"] == "remove":
+                del container[key]
+            else:
+                container[key] = operation["value"]
+        else:
+            if operation["op"] == "remove":
+                del container[key]
+            else:
+                container[key] = operation["value"]
+    return document
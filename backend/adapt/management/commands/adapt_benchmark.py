@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adapt import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the schema builder, the table query and the state.  See adapt.benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="How many people --seed makes")
+        parser.add_argument("--seed", action="store_true", help="Fill the dummy tables first")
+        parser.add_argument("--models", type=int, default=10, help="How many models the schema is built for")
+        parser.add_argument("--depth", type=int, default=6, help="How deep the model graph is")
+        parser.add_argument("--page-sizes", default="10,50,500", help="Page sizes for the table query")
+        parser.add_argument("--repeat", type=int, default=benchmarks.DEFAULT_REPEAT)
+        parser.add_argument("--no-state", action="store_true", help="Skip the state benchmarks, which save the state")
+        parser.add_argument("--output", help="Write the results to this file rather than stdout")
+        parser.add_argument("--baseline", help="Results of an earlier run to compare with")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="How much slower counts as a regression")
+        parser.add_argument(
+            "--min-delta",
+            type=float,
+            default=1.0,
+            help="How many milliseconds slower a regression must be, as well as the tolerance",
+        )
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            benchmarks.seed(options["rows"], log=lambda message: self.stderr.write(message))
+
+        results = benchmarks.run(
+            models=options["models"],
+            depth=options["depth"],
+            page_sizes=[int(page_size) for page_size in options["page_sizes"].split(",")],
+            repeat=options["repeat"],
+            state=not options["no_state"],
+        )
+        results["environment"]["rows"] = benchmarks.Person.objects.count()
+
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+            regressions = []
+            for name, base_ms, ms, ratio, regressed in benchmarks.compare(
+                results, baseline, options["tolerance"], options["min_delta"]
+            ):
+                self.stderr.write(f'{"REGRESSED" if regressed else "ok":<10}{name:<45}{base_ms:>10.3f}ms{ms:>10.3f}ms{ratio:>8.2f}x')
+                if regressed:
+                    regressions.append(name)
+            if regressions:
+                raise CommandError(f'{len(regressions)} benchmarks regressed: {", ".join(regressions)}')
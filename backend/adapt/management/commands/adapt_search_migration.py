@@ -0,0 +1,73 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db.migrations import Migration
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from adapt.search import FULL_TEXT_SEARCH, SEARCH_CONFIG, AddSearchVector, SearchConfigurationError, check_search_fields
+
+
+def get_current_vector(loader, app_label, model_name):
+    """
+    (fields, config) of the last AddSearchVector for the model, if any
+    """
+    current = None
+    for key in loader.graph.forwards_plan(loader.graph.leaf_nodes(app_label)[0]):
+        if key[0] != app_label:
+            continue
+        for operation in loader.graph.nodes[key].operations:
+            if isinstance(operation, AddSearchVector) and operation.model_name.lower() == model_name.lower():
+                current = (operation.fields, operation.config)
+    return current
+
+
+class Command(BaseCommand):
+    help = "Writes the migrations which add the search vectors of ADAPT_FULL_TEXT_SEARCH.  See adapt.search"
+
+    def add_arguments(self, parser):
+        parser.add_argument("app_label", nargs="*", help="Only the models of these apps")
+        parser.add_argument("--dry-run", action="store_true", help="Show the migrations rather than write them")
+
+    def handle(self, *args, **options):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+
+        operations = {}
+        for label, fields in FULL_TEXT_SEARCH.items():
+            try:
+                model = apps.get_model(label)
+                check_search_fields(model, fields)
+            except (LookupError, SearchConfigurationError) as error:
+                raise CommandError(str(error))
+            app_label = model._meta.app_label
+            if options["app_label"] and app_label not in options["app_label"]:
+                continue
+            if not loader.graph.leaf_nodes(app_label):
+                raise CommandError(f'{app_label} has no migrations yet, run makemigrations first')
+            if get_current_vector(loader, app_label, model.__name__) == (list(fields), SEARCH_CONFIG):
+                continue
+            operations.setdefault(app_label, []).append(
+                AddSearchVector(model_name=model.__name__, fields=fields, config=SEARCH_CONFIG)
+            )
+
+        if not operations:
+            self.stdout.write("No changes")
+            return
+
+        for app_label, app_operations in operations.items():
+            leaf = loader.graph.leaf_nodes(app_label)
+            if len(leaf) > 1:
+                raise CommandError(f'{app_label} has more than one leaf migration, merge them first')
+            number = (MigrationAutodetector.parse_number(leaf[0][1]) or 0) + 1
+            fragment = "_".join(operation.migration_name_fragment for operation in app_operations)
+            migration = Migration(f'{number:04}_{fragment}'[:52], app_label)
+            migration.dependencies = leaf
+            migration.operations = app_operations
+
+            writer = MigrationWriter(migration)
+            if options["dry_run"]:
+                self.stdout.write(writer.as_string())
+                continue
+            with open(writer.path, "w") as f:
+                f.write(writer.as_string())
+            self.stdout.write(f'Wrote {writer.path}')
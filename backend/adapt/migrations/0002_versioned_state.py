@@ -0,0 +1,58 @@
+# Generated by Django 4.0.6 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import json
+
+
+def collapse_state_history(apps, schema_editor):
+    """
+    Previously every save created a new row holding the state as a json string.
+    Keep only the latest, as the snapshot, and store it as a json document so
+    it can be diffed.
+    """
+    Adapt = apps.get_model('adapt', 'Adapt')
+    latest = Adapt.objects.order_by('pk').last()
+    if latest is None:
+        return
+    Adapt.objects.exclude(pk=latest.pk).delete()
+    if isinstance(latest.state, str):
+        try:
+            latest.state = json.loads(latest.state)
+        except ValueError:
+            return
+        latest.save(update_fields=['state'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adapt', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adapt',
+            name='snapshot_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='adapt',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='AdaptStateDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('patch', models.JSONField()),
+                ('adapt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deltas', to='adapt.adapt')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='adaptstatedelta',
+            constraint=models.UniqueConstraint(fields=('adapt', 'version'), name='unique_adapt_state_version'),
+        ),
+        migrations.RunPython(collapse_state_history, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,24 @@
 from django.db import models
 
 class Adapt(models.Model):
+    """
+    The state is a snapshot taken at snapshot_version.  The changes made
+    since are kept as json patches in AdaptStateDelta, the latest of which
+    is at version.
+    """
     state = models.JSONField()
+    snapshot_version = models.PositiveIntegerField(default=1)
+    version = models.PositiveIntegerField(default=1)
+
+
+class AdaptStateDelta(models.Model):
+    adapt = models.ForeignKey(Adapt, on_delete=models.CASCADE, related_name="deltas")
+    # the patch takes the state at the version of the delta before it (or
+    # the snapshot) to the state at version, which need not be one more
+    version = models.PositiveIntegerField()
+    patch = models.JSONField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["adapt", "version"], name="unique_adapt_state_version")
+        ]
@@ -0,0 +1,267 @@
+from dataclasses import asdict
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from adapt.pages import page_cache
+
+
+'''
+
+Saving the default model forms behind the <model>_default mutations.
+
+The bulk version validates every input before anything is written, then writes
+them all in one transaction with bulk_create and bulk_update.  Validating a
+ModelForm normally costs a query per choice field per form (to look up the
+chosen objects) and more to check uniqueness.  So instead the chosen objects
+for every form are looked up together, one query per choice field, and the
+unique fields are checked across the forms and against the database
+together, one query per unique field.  Uniqueness across several fields
+(unique_together and constraints) is left to the database, which rolls back
+the whole transaction if it is broken.
+
+'''
+
+
+def get_form_data(input):
+    data = asdict(input)
+    data.pop("id", None)
+    return {key: value for key, value in data.items() if value is not None}
+
+
+def get_instance_id(input):
+    return getattr(input, "id", None)
+
+
+def get_instances(model, instance_ids):
+    """
+    {str(pk): instance} for the instances of model which exist
+    """
+    pks = []
+    for instance_id in instance_ids:
+        try:
+            pks.append(model._meta.pk.to_python(instance_id))
+        except ValidationError:
+            continue
+    return {str(pk): instance for pk, instance in model.objects.in_bulk(pks).items()}
+
+
+def get_does_not_exist_errors(model, instance_id):
+    return {"id": [f'{model.__name__} {instance_id} does not exist']}
+
+
+def save_form(form_class, input):
+    """
+    Returns the saved instance and the form errors, one of which is None.
+    """
+    model = form_class._meta.model
+    instance = None
+    if (instance_id := get_instance_id(input)) is not None:
+        if (instance := get_instances(model, [instance_id]).get(str(instance_id))) is None:
+            return None, get_does_not_exist_errors(model, instance_id)
+
+    form = form_class(data=get_form_data(input), instance=instance)
+    if not form.is_valid():
+        return None, form.errors
+    return form.save(), None
+
+
+def _values(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return value
+    return [value]
+
+
+def get_choice_key(field, value):
+    """
+    The key of the object chosen by value in the ModelChoiceField field,
+    or None if value cannot be one, e.g. "abc" for an integer primary key
+    """
+    model = field.queryset.model
+    key_field = model._meta.get_field(field.to_field_name) if field.to_field_name else model._meta.pk
+    try:
+        return key_field.to_python(value)
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+def prefetch_choices(form_class, data_list):
+    """
+    choice field name -> {str(key): obj} for every object chosen in data_list.
+    The values which cannot be keys are left out, so are invalid choices.
+    """
+    choices = {}
+    for name, field in form_class.base_fields.items():
+        if not isinstance(field, forms.ModelChoiceField):
+            continue
+        key = field.to_field_name or "pk"
+        values = {
+            choice_key
+            for data in data_list
+            for value in _values(data.get(name))
+            if value not in field.empty_values
+            and (choice_key := get_choice_key(field, value)) is not None
+        }
+        objs = field.queryset.filter(**{f'{key}__in': values}) if values else []
+        choices[name] = {str(getattr(obj, key)): obj for obj in objs}
+    return choices
+
+
+def use_prefetched_choices(form, choices):
+    """
+    Makes the form's choice fields look up the prefetched objects
+    rather than query for them.
+    """
+    for name, objs in choices.items():
+        field = form.fields[name]
+
+        def lookup(value, field=field, objs=objs):
+            try:
+                return objs[str(get_choice_key(field, value))]
+            except KeyError:
+                raise ValidationError(
+                    field.error_messages["invalid_choice"],
+                    code="invalid_choice",
+                    params={"value": value},
+                )
+
+        if isinstance(field, forms.ModelMultipleChoiceField):
+            field._check_values = lambda values, lookup=lookup: [lookup(value) for value in values]
+        else:
+            field.to_python = lambda value, field=field, lookup=lookup: (
+                None if value in field.empty_values else lookup(value)
+            )
+
+    # see validate_unique_fields
+    form.validate_unique = lambda: None
+
+
+def validate_unique_fields(form_class, forms_by_index):
+    """
+    [(index, errors)] for the forms which give a unique field a value
+    another form, or another instance in the database, already has
+    """
+    model = form_class._meta.model
+    errors = {}
+    for field in model._meta.concrete_fields:
+        if not field.unique or field.primary_key or field.name not in form_class.base_fields:
+            continue
+
+        # value -> index of the first form with it
+        indexes = {}
+        for index, form in forms_by_index:
+            if (value := getattr(form.instance, field.attname)) is None:
+                continue
+            if value in indexes:
+                errors.setdefault(index, {})[field.name] = form.instance.unique_error_message(
+                    model, [field.name]
+                ).messages
+            else:
+                indexes[value] = index
+        if not indexes:
+            continue
+
+        instances = {index: form.instance for index, form in forms_by_index}
+        taken = model.objects.filter(**{f'{field.attname}__in': indexes}).values_list(field.attname, "pk")
+        for value, pk in taken:
+            index = indexes[value]
+            if pk != instances[index].pk:
+                errors.setdefault(index, {})[field.name] = instances[index].unique_error_message(
+                    model, [field.name]
+                ).messages
+    return sorted(errors.items())
+
+
+def bulk_save_forms(form_class, inputs):
+    """
+    Returns the saved instances and a list of (index, errors) for the
+    inputs which are not valid.  Nothing is saved unless every input is valid.
+    """
+    model = form_class._meta.model
+    data_list = [get_form_data(input) for input in inputs]
+    instance_ids = [get_instance_id(input) for input in inputs]
+
+    existing = get_instances(model, [pk for pk in instance_ids if pk is not None])
+    choices = prefetch_choices(form_class, data_list)
+
+    valid_forms = []
+    errors = []
+    for index, (data, instance_id) in enumerate(zip(data_list, instance_ids)):
+        if instance_id is not None and str(instance_id) not in existing:
+            errors.append((index, get_does_not_exist_errors(model, instance_id)))
+            continue
+        form = form_class(
+            data=data,
+            instance=existing.get(str(instance_id)) if instance_id is not None else None,
+        )
+        use_prefetched_choices(form, choices)
+        if form.is_valid():
+            valid_forms.append((index, form))
+        else:
+            errors.append((index, form.errors))
+
+    errors.extend(validate_unique_fields(form_class, valid_forms))
+    if errors:
+        return None, sorted(errors, key=lambda error: error[0])
+    valid_forms = [form for _, form in valid_forms]
+
+    to_create = []
+    to_update = []
+    for form in valid_forms:
+        instance = form.save(commit=False)
+        (to_update if instance.pk is not None else to_create).append(instance)
+
+    many_to_many_fields = [
+        field
+        for field in model._meta.many_to_many
+        if field.name in form_class.base_fields
+    ]
+    update_fields = [
+        field.name
+        for field in model._meta.concrete_fields
+        if field.name in form_class.base_fields and not field.primary_key
+    ]
+
+    with transaction.atomic():
+        model.objects.bulk_create(to_create)
+        if to_update and update_fields:
+            model.objects.bulk_update(to_update, update_fields)
+        for field in many_to_many_fields:
+            bulk_set_many_to_many(field, valid_forms)
+        # the bulk queries send no signals, so the cached pages are
+        # invalidated here, and again once this commits
+        page_cache.invalidate(model)
+        for field in many_to_many_fields:
+            page_cache.invalidate(field.remote_field.through)
+
+    return [form.instance for form in valid_forms], None
+
+
+def bulk_set_many_to_many(field, valid_forms):
+    """
+    Replaces the relations of every instance with the chosen objects, with one
+    delete and one insert on the through table.
+    """
+    through = field.remote_field.through
+    source_name = field.m2m_field_name()
+    target_name = field.m2m_reverse_field_name()
+    # e.g. Person.friends - each relation is stored both ways round
+    symmetrical = field.remote_field.symmetrical and field.related_model == field.model
+
+    instances = [form.instance for form in valid_forms]
+    existing = Q(**{f'{source_name}__in': instances})
+    if symmetrical:
+        existing |= Q(**{f'{target_name}__in': instances})
+    through.objects.filter(existing).delete()
+
+    relations = []
+    for form in valid_forms:
+        for obj in form.cleaned_data.get(field.name) or []:
+            relations.append(through(**{source_name: form.instance, target_name: obj}))
+            if symmetrical:
+                relations.append(through(**{source_name: obj, target_name: form.instance}))
+    through.objects.bulk_create(relations, ignore_conflicts=True)
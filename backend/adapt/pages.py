@@ -0,0 +1,220 @@
+import dataclasses
+import hashlib
+import json
+import threading
+import time
+from typing import List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from adapt.caching import get_cache
+from adapt.pagination import PageInfo
+
+
+'''
+
+A cache of the pages of the table query, so opening the same list again does
+not run the same joined query again.
+
+A page is cached under its model, columns, filters, search, ordering and
+cursor along with the version of every model the page is read from - the
+model itself, every model joined to for its columns and the models (and many
+to many tables) of its aggregated columns.  Saving or deleting any of those
+(post_save, post_delete, m2m_changed) bumps the version of that model, so the
+pages which read from it are never found again and age out of the cache.
+
+The pages, and the versions, are kept in the ADAPT_PAGE_CACHE cache (see
+adapt.caching) for PAGE_CACHE_TTL seconds, and in this process there are up
+to PAGE_CACHE_SIZE of them.  A PAGE_CACHE_TTL of 0 turns the cache off.
+
+Changes which do not send signals - queryset.update, bulk_create and raw SQL
+- are only seen once the cached pages expire, unless whatever makes them
+calls page_cache.invalidate(model) as the bulk mutations do.
+
+'''
+
+
+PAGE_CACHE_TTL = getattr(settings, "ADAPT_PAGE_CACHE_TTL", 30)
+PAGE_CACHE_SIZE = getattr(settings, "ADAPT_PAGE_CACHE_SIZE", 500)
+
+M2M_ACTIONS = {"post_add", "post_remove", "post_clear"}
+
+
+@dataclasses.dataclass(frozen=True)
+class Page:
+    cursors: List[str]
+    # the formatted values of each row
+    values: List[list]
+    page_info: PageInfo
+
+
+def get_through_model(field):
+    if not field.many_to_many:
+        return None
+    # the ManyToManyRel of a ManyToManyField, or the field if it is the rel
+    return (field.remote_field if field.concrete else field).through
+
+
+def get_dependencies(metadata):
+    """
+    Every model the pages of metadata.model are read from
+    """
+    model = metadata.model
+    dependencies = {model, *metadata.related_models}
+    for aggregate in metadata.aggregates.values():
+        dependencies.add(aggregate.related_model)
+        if (through := get_through_model(model._meta.get_field(aggregate.field_path))) is not None:
+            dependencies.add(through)
+    return dependencies
+
+
+def to_json(value):
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    return str(value)
+
+
+class PageCacheBackend:
+    """
+    The pages, and the versions, in the ADAPT_PAGE_CACHE cache
+    """
+
+    KEY = "adapt:page:{key}"
+    VERSION_KEY = "adapt:page-version:{label}"
+
+    def __init__(self, alias=None, maxsize=500):
+        self.alias = alias
+        self.maxsize = maxsize
+
+    @property
+    def cache(self):
+        return get_cache(self.alias, "pages", self.maxsize)
+
+    def get(self, key):
+        return self.cache.get(self.KEY.format(key=key))
+
+    def set(self, key, page, ttl):
+        self.cache.set(self.KEY.format(key=key), page, timeout=ttl)
+
+    def get_versions(self, labels):
+        cache = self.cache
+        keys = [self.VERSION_KEY.format(label=label) for label in labels]
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # not a count from 0, which could bring back the pages of a
+                # version which was evicted
+                cache.add(key, time.time_ns(), timeout=None)
+                versions[key] = cache.get(key)
+        return [versions[key] for key in keys]
+
+    def bump(self, label):
+        key = self.VERSION_KEY.format(label=label)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, time.time_ns(), timeout=None)
+
+    def clear(self):
+        # the pages of other processes are left to expire
+        if not self.alias:
+            self.cache.clear()
+
+
+class PageCache:
+
+    def __init__(self, ttl=30, backend=None):
+        self.ttl = ttl
+        self.backend = backend if backend is not None else PageCacheBackend()
+        # model -> the labels of the models its pages are read from
+        self._dependencies = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def watch(self, metadata):
+        """
+        Caches the pages of metadata.model from now on, connecting the
+        signals which invalidate them
+        """
+        dependencies = get_dependencies(metadata)
+        for model in dependencies:
+            uid = f'adapt.pages.{id(self)}.{model._meta.label}'
+            post_save.connect(self._on_change, sender=model, weak=False, dispatch_uid=uid)
+            post_delete.connect(self._on_change, sender=model, weak=False, dispatch_uid=uid)
+            # only sent by the through models of many to many relations
+            m2m_changed.connect(self._on_m2m_changed, sender=model, weak=False, dispatch_uid=uid)
+        self._dependencies[metadata.model] = sorted(model._meta.label for model in dependencies)
+
+    def invalidate(self, model):
+        label = model._meta.label
+        self.backend.bump(label)
+        with self._lock:
+            self.invalidations += 1
+        # and again once the change is committed, in case a page was
+        # read from before the change in the meantime
+        transaction.on_commit(lambda: self.backend.bump(label))
+
+    def _on_change(self, sender, **kwargs):
+        self.invalidate(sender)
+
+    def _on_m2m_changed(self, sender, action, **kwargs):
+        if action in M2M_ACTIONS:
+            self.invalidate(sender)
+
+    def get_key(self, model, arguments):
+        labels = self._dependencies[model]
+        description = json.dumps(
+            [model._meta.label, arguments, list(zip(labels, self.backend.get_versions(labels)))],
+            default=to_json,
+        )
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def get_or_build(self, metadata, arguments, build):
+        """
+        The cached page of metadata.model for arguments, otherwise the page
+        build returns.  The pages of models which are not watched are never
+        cached, because nothing would invalidate them.
+        """
+        if not self.enabled or metadata.model not in self._dependencies:
+            return build()
+        key = self.get_key(metadata.model, arguments)
+        if (page := self.backend.get(key)) is not None:
+            with self._lock:
+                self.hits += 1
+            return page
+        with self._lock:
+            self.misses += 1
+        page = build()
+        self.backend.set(key, page, self.ttl)
+        return page
+
+    def get_stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations}
+
+    def render(self):
+        """
+        The counters in the Prometheus text format
+        """
+        lines = []
+        for name, value in self.get_stats().items():
+            lines.append(f'# TYPE adapt_page_cache_{name}_total counter')
+            lines.append(f'adapt_page_cache_{name}_total {value}')
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        self.backend.clear()
+
+
+page_cache = PageCache(
+    ttl=PAGE_CACHE_TTL,
+    backend=PageCacheBackend(getattr(settings, "ADAPT_PAGE_CACHE", None), PAGE_CACHE_SIZE),
+)
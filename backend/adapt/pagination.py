@@ -0,0 +1,218 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Optional
+
+import strawberry
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+
+'''
+
+Keyset (a.k.a. seek) pagination for the table query.
+
+Rather than OFFSET / LIMIT, which gets slower the deeper into the table you
+page, we order by an ordering key which always finishes with the primary key
+(so it is unique) and ask the database for the rows strictly after (or before)
+the key of the cursor.  The cursor is just the ordering key of the row, json
+encoded then base64 encoded so the client treats it as opaque.
+
+Dates and times are encoded to the microsecond, and decoded back into their
+python types with the field's to_python, so that the keyset filter compares
+the exact value of the row rather than a rounded one.  Otherwise rows which
+differ by less than a millisecond would never be paged past.
+
+An ordering is a list of (field, descending) tuples, e.g.
+
+    [("name", False), ("pk", False)]
+
+'''
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+DEFAULT_ORDERING = [("pk", False)]
+
+
+class PaginationError(Exception):
+    pass
+
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    has_previous_page: bool
+    start_cursor: Optional[str]
+    end_cursor: Optional[str]
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder cuts datetimes and times down to milliseconds
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), cls=CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def get_ordering_field(model, field_path):
+    """
+    The model field at the end of field_path, or None for an annotation
+    e.g. the search rank
+    """
+    try:
+        *relations, field_name = field_path.split("__")
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.pk if field_name == "pk" else model._meta.get_field(field_name)
+    except (FieldDoesNotExist, AttributeError):
+        return None
+
+
+def decode_cursor(cursor, ordering, model=None):
+    """
+    If the model is given the values are turned back into the python types
+    of the fields in the ordering.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise PaginationError(f'Invalid cursor "{cursor}"')
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise PaginationError(f'Cursor "{cursor}" does not match the ordering')
+    if model is None:
+        return values
+    try:
+        return [
+            value if value is None or field is None else field.to_python(value)
+            for value, field in zip(values, (get_ordering_field(model, field) for field, _ in ordering))
+        ]
+    except ValidationError:
+        raise PaginationError(f'Cursor "{cursor}" does not match the ordering')
+
+
+def reverse_ordering(ordering):
+    return [(field, not descending) for field, descending in ordering]
+
+
+def get_order_by(ordering):
+    """
+    Nulls are placed last for ascending and first for descending columns.
+    This is what Postgres does anyway but we need it to be explicit so that
+    the keyset filter agrees with the ordering on every database.
+    """
+    return [
+        F(field).desc(nulls_first=True) if descending else F(field).asc(nulls_last=True)
+        for field, descending in ordering
+    ]
+
+
+def _after_value(field, descending, value):
+    # rows strictly after `value` for this one column, or None if there are none
+    if value is None:
+        return None if not descending else Q(**{f'{field}__isnull': False})
+    if descending:
+        return Q(**{f'{field}__lt': value})
+    return Q(**{f'{field}__gt': value}) | Q(**{f'{field}__isnull': True})
+
+
+def _equal_to_value(field, value):
+    if value is None:
+        return Q(**{f'{field}__isnull': True})
+    return Q(**{field: value})
+
+
+def get_keyset_filter(ordering, values):
+    """
+    Rows which come strictly after `values` in `ordering`.
+
+    For the ordering (a, b, pk) this is -
+
+        a > A or (a = A and b > B) or (a = A and b = B and pk > PK)
+    """
+    keyset_filter = Q(pk__in=[])
+    equal = Q()
+    for (field, descending), value in zip(ordering, values):
+        if (after := _after_value(field, descending, value)) is not None:
+            keyset_filter |= equal & after
+        equal &= _equal_to_value(field, value)
+    return keyset_filter
+
+
+def get_page_size(first, last):
+    if first is not None and last is not None:
+        raise PaginationError("Pass either first or last, not both")
+    size = first if first is not None else last
+    if size is None:
+        return DEFAULT_PAGE_SIZE
+    if size < 0:
+        raise PaginationError("first and last must not be negative")
+    return min(size, MAX_PAGE_SIZE)
+
+
+def paginate(queryset, fields=None, ordering=None, first=None, after=None, last=None, before=None):
+    """
+    Returns the rows of the page as a list of (cursor, values) tuples
+    along with the PageInfo.
+
+    If no fields are given the rows are (cursor, model instance) tuples
+    instead, in which case the ordering can only use the model's own fields.
+
+    Only page size + 1 rows are ever fetched from the database, the extra
+    row telling us whether there is another page.
+    """
+    ordering = list(ordering or DEFAULT_ORDERING)
+    page_size = get_page_size(first, last)
+    forward = last is None
+
+    if after is not None:
+        queryset = queryset.filter(
+            get_keyset_filter(ordering, decode_cursor(after, ordering, queryset.model))
+        )
+    if before is not None:
+        queryset = queryset.filter(
+            get_keyset_filter(reverse_ordering(ordering), decode_cursor(before, ordering, queryset.model))
+        )
+
+    key_fields = [field for field, _ in ordering]
+    queryset = queryset.order_by(
+        *get_order_by(ordering if forward else reverse_ordering(ordering))
+    )
+    if fields is not None:
+        queryset = queryset.values_list(*fields, *key_fields)
+
+    objs = list(queryset[:page_size + 1])
+    has_more = len(objs) > page_size
+    objs = objs[:page_size]
+    if not forward:
+        objs.reverse()
+
+    if fields is None:
+        rows = [
+            (encode_cursor([getattr(obj, field) for field in key_fields]), obj)
+            for obj in objs
+        ]
+    else:
+        number_of_fields = len(fields)
+        rows = [
+            (encode_cursor(obj[number_of_fields:]), obj[:number_of_fields])
+            for obj in objs
+        ]
+
+    page_info = PageInfo(
+        has_next_page=has_more if forward else before is not None,
+        has_previous_page=has_more if not forward else after is not None,
+        start_cursor=rows[0][0] if rows else None,
+        end_cursor=rows[-1][0] if rows else None,
+    )
+
+    return rows, page_info
@@ -0,0 +1,182 @@
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Tuple
+
+from adapt.aggregates import get_aggregate_column, get_aggregates
+from adapt.filters import is_string_field
+from adapt.formatters import AGGREGATE_FORMATTER, get_column_formatter
+from adapt.graph import model_graph
+
+
+'''
+
+The metadata for each registered model is worked out once, when register is called,
+so that resolvers never have to walk model._meta themselves.
+
+Everything held here is immutable.  If the models change (e.g. in tests) call
+invalidate and the metadata is rebuilt the next time it is asked for.
+
+'''
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelMetadata:
+    model: Any
+    # the column dicts from get_columns_from_django_model, each wrapped in a MappingProxyType
+    columns: Tuple[Mapping, ...]
+    # the field path of every column e.g. ("id", "name", "address__post_code")
+    field_paths: Tuple[str, ...]
+    # field path -> the django model field at the end of the path
+    fields: Mapping[str, Any]
+    # field path -> the models joined to reach the field, excluding the model itself
+    related_model_chains: Mapping[str, Tuple[Any, ...]]
+    # every model joined to by at least one column
+    related_models: frozenset
+    # the field paths of the text columns, which the free text search looks in
+    search_field_paths: Tuple[str, ...]
+    # the relation paths joined to for the columns e.g. ("address", "work", "work__address")
+    join_paths: Tuple[str, ...]
+    # field path -> the ColumnFormatter for the column's values
+    formatters: Mapping[str, Any]
+    # the columns for the many to many and reverse relations, see adapt.aggregates
+    aggregate_columns: Tuple[Mapping, ...]
+    # field path -> the Aggregate for those columns
+    aggregates: Mapping[str, Any]
+
+
+def resolve_field_path(model, field_path):
+    """
+    Follows a field path like "work__address__post_code" from model and
+    returns the field at the end along with the models passed through.
+    """
+    chain = []
+    *relations, field_name = field_path.split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+        chain.append(model)
+    return model._meta.get_field(field_name), tuple(chain)
+
+
+def get_join_paths(field_paths):
+    join_paths = {}
+    for field_path in field_paths:
+        relations = field_path.split("__")[:-1]
+        for depth in range(1, len(relations) + 1):
+            join_paths["__".join(relations[:depth])] = None
+    return tuple(join_paths)
+
+
+def build_model_metadata(model, columns=None, graph=model_graph):
+    """
+    columns are worked out from the model unless they are given
+    """
+    if columns is None:
+        columns = graph.get_columns(model)
+
+    columns = tuple(
+        MappingProxyType({**column, "related_models": tuple(column["related_models"])})
+        for column in columns
+    )
+    field_paths = tuple(column["field"] for column in columns)
+    aggregates = get_aggregates(model)
+
+    fields = {}
+    related_model_chains = {}
+    for field_path in field_paths:
+        fields[field_path], related_model_chains[field_path] = resolve_field_path(model, field_path)
+
+    return ModelMetadata(
+        model=model,
+        columns=columns,
+        field_paths=field_paths,
+        fields=MappingProxyType(fields),
+        related_model_chains=MappingProxyType(related_model_chains),
+        related_models=frozenset(
+            related_model
+            for chain in related_model_chains.values()
+            for related_model in chain
+        ),
+        search_field_paths=tuple(
+            field_path
+            for field_path in field_paths
+            if is_string_field(fields[field_path])
+        ),
+        join_paths=get_join_paths(field_paths),
+        formatters=MappingProxyType({
+            **{
+                field_path: get_column_formatter(field)
+                for field_path, field in fields.items()
+            },
+            **{aggregate.field_path: AGGREGATE_FORMATTER for aggregate in aggregates},
+        }),
+        aggregate_columns=tuple(
+            MappingProxyType(get_aggregate_column(model, aggregate))
+            for aggregate in aggregates
+        ),
+        aggregates=MappingProxyType({
+            aggregate.field_path: aggregate
+            for aggregate in aggregates
+        }),
+    )
+
+
+class ModelRegistry:
+
+    def __init__(self, django_models, graph=model_graph):
+        self.models = MappingProxyType({
+            django_model.__name__: django_model
+            for django_model in django_models
+        })
+        self.graph = graph
+        self._metadata = {}
+
+    def __iter__(self):
+        return iter(self.models.values())
+
+    def get_model(self, name):
+        try:
+            return self.models[name]
+        except KeyError:
+            raise LookupError(f'"{name}" is not a registered model')
+
+    def get(self, model):
+        """
+        model can either be the model class or the model name
+        """
+        if isinstance(model, str):
+            model = self.get_model(model)
+        if (metadata := self._metadata.get(model)) is None:
+            metadata = self._metadata[model] = build_model_metadata(model, graph=self.graph)
+        return metadata
+
+    def build(self):
+        for model in self:
+            self.get(model)
+        for name, expansion in self.get_expansions().items():
+            logger.debug(
+                "%s expands to %s columns and %s joins",
+                name, expansion["columns"], expansion["joins"],
+            )
+        return self
+
+    def get_expansions(self):
+        """
+        model name -> how many columns and joins the model expands to
+        """
+        return {
+            name: {
+                "columns": len(self.get(model).columns),
+                "joins": len(self.get(model).join_paths),
+            }
+            for name, model in self.models.items()
+        }
+
+    def invalidate(self, model=None):
+        if model is None:
+            self._metadata.clear()
+        else:
+            self._metadata.pop(model, None)
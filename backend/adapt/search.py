@@ -0,0 +1,220 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.migrations.operations.base import Operation
+from django.db.models import CharField, Expression, F, FloatField, TextField
+from django.db.models.functions import Cast
+
+
+'''
+
+Full text search for the table query, on Postgres, for the models which opt
+in with ADAPT_FULL_TEXT_SEARCH -
+
+    ADAPT_FULL_TEXT_SEARCH = {"dummy.Person": ["name", "age"]}
+
+which maps the label of a model to the text fields which are searched.  They
+must be fields of the model itself, not of related models, because they are
+kept in a generated column which can only read its own row -
+
+    adapt_search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(age, '')), 'B')
+    ) STORED
+
+with a GIN index.  Postgres keeps it up to date on every insert and update.
+Then run
+
+    python manage.py adapt_search_migration
+
+to write the migrations which add (or, once the fields change, replace) the
+column and the index.
+
+Each word of the search matches the words in the vector which start with it,
+and unless the table query is ordered by something else the rows are ordered
+by their ts_rank, best first.  On other databases, or for the models which
+have not opted in, search is a case insensitive LIKE over every text column
+as before.
+
+'''
+
+
+FULL_TEXT_SEARCH = getattr(settings, "ADAPT_FULL_TEXT_SEARCH", {})
+SEARCH_CONFIG = getattr(settings, "ADAPT_SEARCH_CONFIG", "simple")
+
+SEARCH_VECTOR_COLUMN = "adapt_search_vector"
+# the alias of the vector, and the annotation of the rank, on the queryset
+SEARCH_VECTOR = "_search_vector"
+SEARCH_RANK = "_search_rank"
+
+WEIGHTS = "ABCD"
+
+
+class SearchConfigurationError(Exception):
+    pass
+
+
+def get_search_fields(model):
+    """
+    The names of the fields in model's vector, or None if it has no vector
+    """
+    return FULL_TEXT_SEARCH.get(model._meta.label)
+
+
+def check_search_fields(model, field_names):
+    for field_name in field_names:
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            raise SearchConfigurationError(f'"{field_name}" is not a field of {model._meta.label}')
+        if not isinstance(field, (CharField, TextField)):
+            raise SearchConfigurationError(
+                f'"{field_name}" of {model._meta.label} is not a text field, so cannot be searched'
+            )
+
+
+def uses_full_text_search(model, using):
+    return bool(get_search_fields(model)) and connections[using].vendor == "postgresql"
+
+
+def get_index_name(model):
+    return f'{model._meta.db_table}_search_vector'[:63]
+
+
+def get_vector_sql(model, field_names, config, quote_name):
+    return " || ".join(
+        f"setweight(to_tsvector('{config}', coalesce({quote_name(model._meta.get_field(field_name).column)}, ''))"
+        f", '{WEIGHTS[min(index, len(WEIGHTS) - 1)]}')"
+        for index, field_name in enumerate(field_names)
+    )
+
+
+class AddSearchVector(Operation):
+    """
+    Adds the generated search vector column, and its GIN index, to the
+    table of model_name, replacing any there already.  Does nothing on
+    databases other than Postgres.
+
+    Reversing it drops the vector, so reversing a migration which
+    replaced one leaves the model without a vector until migrated again.
+    """
+
+    reduces_to_sql = True
+    reversible = True
+
+    def __init__(self, model_name, fields, config=SEARCH_CONFIG):
+        self.model_name = model_name
+        self.fields = list(fields)
+        self.config = config
+
+    def deconstruct(self):
+        return (
+            self.__class__.__name__,
+            [],
+            {"model_name": self.model_name, "fields": self.fields, "config": self.config},
+        )
+
+    def state_forwards(self, app_label, state):
+        # the column is not a field of the model
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        model = to_state.apps.get_model(app_label, self.model_name)
+        check_search_fields(model, self.fields)
+        if not re.fullmatch(r"\w+", self.config):
+            raise SearchConfigurationError(f'"{self.config}" is not a text search configuration')
+        quote_name = schema_editor.quote_name
+        self._drop(model, schema_editor)
+        schema_editor.execute(
+            f'ALTER TABLE {quote_name(model._meta.db_table)} '
+            f'ADD COLUMN {quote_name(SEARCH_VECTOR_COLUMN)} tsvector '
+            f'GENERATED ALWAYS AS ({get_vector_sql(model, self.fields, self.config, quote_name)}) STORED'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {quote_name(get_index_name(model))} '
+            f'ON {quote_name(model._meta.db_table)} USING GIN ({quote_name(SEARCH_VECTOR_COLUMN)})'
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        self._drop(from_state.apps.get_model(app_label, self.model_name), schema_editor)
+
+    def _drop(self, model, schema_editor):
+        quote_name = schema_editor.quote_name
+        schema_editor.execute(f'DROP INDEX IF EXISTS {quote_name(get_index_name(model))}')
+        schema_editor.execute(
+            f'ALTER TABLE {quote_name(model._meta.db_table)} '
+            f'DROP COLUMN IF EXISTS {quote_name(SEARCH_VECTOR_COLUMN)}'
+        )
+
+    def describe(self):
+        return f'Add a search vector of {", ".join(self.fields)} to {self.model_name}'
+
+    @property
+    def migration_name_fragment(self):
+        return f'{self.model_name.lower()}_search_vector'
+
+
+class SearchVectorColumn(Expression):
+    """
+    The search vector column of the queryset's model, which is not a field
+    """
+
+    def __init__(self):
+        # django.contrib.postgres needs psycopg2, so is only imported on Postgres
+        from django.contrib.postgres.search import SearchVectorField
+        super().__init__(output_field=SearchVectorField())
+
+    def as_sql(self, compiler, connection):
+        alias = compiler.query.get_initial_alias()
+        return f'{compiler.quote_name_unless_alias(alias)}.{connection.ops.quote_name(SEARCH_VECTOR_COLUMN)}', []
+
+
+def get_search_query(search):
+    """
+    Every word of search, each matching the words which start with it.
+    None if there are no words.
+    """
+    from django.contrib.postgres.search import SearchQuery
+    words = re.findall(r"\w+", search)
+    if not words:
+        return None
+    return SearchQuery(
+        " & ".join(f"'{word}':*" for word in words),
+        config=SEARCH_CONFIG,
+        search_type="raw",
+    )
+
+
+def search_queryset(queryset, search):
+    if (query := get_search_query(search)) is None:
+        return queryset
+    return queryset.alias(**{SEARCH_VECTOR: SearchVectorColumn()}).filter(**{SEARCH_VECTOR: query})
+
+
+def rank_queryset(queryset, search):
+    """
+    queryset, already searched, with the rank of each row
+    """
+    from django.contrib.postgres.search import SearchRank
+    if (query := get_search_query(search)) is None:
+        return queryset
+    # ts_rank is a real, which would not survive the trip through the cursor
+    rank = Cast(SearchRank(F(SEARCH_VECTOR), query), FloatField())
+    return queryset.annotate(**{SEARCH_RANK: rank})
+
+
+def is_ranked(queryset, search, order_by=None):
+    """
+    Whether the rows of queryset, searched for search, are ordered by rank
+    """
+    return (
+        not order_by
+        and bool(search and re.search(r"\w", search))
+        and uses_full_text_search(queryset.model, queryset.db)
+    )
@@ -0,0 +1,385 @@
+import atexit
+import copy
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from adapt.caching import get_cache
+from adapt.jsonpatch import apply_patch, make_patch
+from adapt.models import Adapt, AdaptStateDelta
+
+
+'''
+
+Versioned storage for the adapt state.
+
+Rather than writing a full copy of the state on every save we keep one
+snapshot and a json patch for each version since.  So a save only writes the
+change.  Once COMPACT_AFTER patches have been stored the snapshot is brought up
+to date and the patches are deleted, so the table never grows beyond that.
+
+Every save bumps the version.  Saving with a version other than the current
+one is rejected, so two tabs cannot silently overwrite each other's changes.
+
+'''
+
+
+DEFAULT_STATE = { 'devtoolsPosition': 'right', 'elements': [], 'elementInView': None }
+
+COMPACT_AFTER = 50
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidState(ValueError):
+    pass
+
+
+class StateConflict(Exception):
+
+    def __init__(self, version):
+        super().__init__(f'The state has since been saved at version {version}')
+        self.version = version
+
+
+def get_adapt(for_update=False):
+    queryset = Adapt.objects.order_by("pk")
+    if for_update:
+        queryset = queryset.select_for_update()
+    return queryset.first()
+
+
+def load_patches(adapt):
+    return list(
+        AdaptStateDelta.objects
+        .filter(adapt=adapt, version__gt=adapt.snapshot_version)
+        .order_by("version")
+        .values_list("patch", flat=True)
+    )
+
+
+def build_state(adapt, patches=None):
+    state = adapt.state
+    for patch in load_patches(adapt) if patches is None else patches:
+        state = apply_patch(state, patch)
+    return state
+
+
+def load_state():
+    """
+    Returns the current state and its version.
+    """
+    adapt = get_adapt()
+    if adapt is None:
+        return DEFAULT_STATE, 0
+    return build_state(adapt), adapt.version
+
+
+def load_version():
+    adapt = get_adapt()
+    return adapt.version if adapt else 0
+
+
+def store_state(state, version=None, new_version=None):
+    """
+    Saves the state, returning the new version.
+
+    If version is given it must be the current version, otherwise
+    StateConflict is raised.  By default the new version is the current one
+    plus one, but a later version can be given instead.
+    """
+    with transaction.atomic():
+        adapt = get_adapt(for_update=True)
+
+        if adapt is None:
+            if version not in (None, 0):
+                raise StateConflict(0)
+            adapt = Adapt.objects.create(
+                state=state,
+                snapshot_version=new_version or 1,
+                version=new_version or 1,
+            )
+            return adapt.version
+
+        if version is not None and version != adapt.version:
+            raise StateConflict(adapt.version)
+
+        patches = load_patches(adapt)
+        patch = make_patch(build_state(adapt, patches), state)
+        if not patch and new_version is None:
+            return adapt.version
+
+        adapt.version = new_version or adapt.version + 1
+
+        if not patch:
+            adapt.save(update_fields=["version"])
+        # by the number of patches, not versions, as the buffer can skip
+        # many versions at once
+        elif len(patches) + 1 >= COMPACT_AFTER:
+            adapt.state = state
+            adapt.snapshot_version = adapt.version
+            adapt.save(update_fields=["state", "snapshot_version", "version"])
+            adapt.deltas.all().delete()
+        else:
+            AdaptStateDelta.objects.create(adapt=adapt, version=adapt.version, patch=patch)
+            adapt.save(update_fields=["version"])
+
+        return adapt.version
+
+
+class StateCache:
+    """
+    Holds the current state, serialised, along with its version so reads
+    need not touch the database.  It is updated on every save.
+
+    The ADAPT_STATE_CACHE cache (see adapt.caching) is only in this process
+    unless it is set, which it must be when there are several processes, as
+    the version held there decides whether the state held here is current.
+    """
+
+    VERSION_KEY = "adapt:state:version"
+    STATE_KEY = "adapt:state:{version}"
+
+    def __init__(self, alias=None):
+        self.alias = alias
+        # the last (state, version) read or written, so the state is only
+        # read from the cache when the version moves on
+        self._current = None
+
+    @property
+    def cache(self):
+        # the state of a few versions, and the current version
+        return get_cache(self.alias, "state", 4)
+
+    def get_version(self):
+        return self.cache.get(self.VERSION_KEY)
+
+    def get(self):
+        """
+        The cached (state, version) or None
+        """
+        version = self.get_version()
+        if version is None:
+            return None
+        if (current := self._current) is not None and current[1] == version:
+            return current
+        state = self.cache.get(self.STATE_KEY.format(version=version))
+        if state is None:
+            return None
+        self._current = (state, version)
+        return self._current
+
+    def set(self, state, version):
+        self._current = (state, version)
+        self.cache.set_many({
+            self.STATE_KEY.format(version=version): state,
+            self.VERSION_KEY: version,
+        })
+
+    def fill(self, state, version):
+        """
+        set, unless a newer version has been cached in the meantime
+        """
+        current_version = self.get_version()
+        # the same version again fills in its state if that was evicted
+        if current_version is None or current_version <= version:
+            self.set(state, version)
+
+    def clear(self):
+        self._current = None
+        self.cache.delete(self.VERSION_KEY)
+
+
+state_cache = StateCache(getattr(settings, "ADAPT_STATE_CACHE", None))
+
+
+def rebase(base_state, state, onto):
+    """
+    The changes which took base_state to state, made to onto instead.
+    Changes to parts of onto which are no longer there are dropped.
+    """
+    document = copy.deepcopy(onto)
+    for operation in make_patch(base_state, state):
+        try:
+            document = apply_patch(document, [operation])
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+    return document
+
+
+@dataclass(frozen=True)
+class PendingState:
+    state: Any
+    version: int
+    # the state and version in the database when the first save was buffered
+    base_state: Any
+    base_version: int
+    saves: int
+
+
+class StateWriteBuffer:
+    """
+    Dragging or resizing in the devtools saves the state many times a second.
+    Instead of writing each save to the database we hold on to the latest
+    state and write it out -
+
+        - after interval seconds
+        - once max_pending saves have been collapsed into it
+        - when a save asks to be durable
+        - when the process exits
+
+    The state is one document shared by everyone so every save collapses
+    into the one pending write.  Reads see the pending state.
+
+    Versions are handed out as if every save was written, so the
+    optimistic concurrency check works the same with or without the buffer.
+    When the pending state is written it is checked against the version the
+    database was at when the state was first buffered.  If another process
+    has written since, the buffered changes are made to its state instead
+    and written at a version after both, so the saves which were accepted
+    are not lost and the clients find the state has moved on.
+    """
+
+    REBASE_ATTEMPTS = 3
+
+    def __init__(self, interval=1.0, max_pending=100, cache=None):
+        self.interval = interval
+        self.max_pending = max_pending
+        # the StateCache to update when the written state is not the pending one
+        self.cache = cache
+        self._lock = threading.RLock()
+        self._pending = None
+        self._timer = None
+        atexit.register(self.flush)
+
+    def load(self):
+        with self._lock:
+            if self._pending is not None:
+                return copy.deepcopy(self._pending.state), self._pending.version
+        return load_state()
+
+    def save(self, state, version=None, durable=False):
+        with self._lock:
+            pending = self._pending
+            if pending is not None:
+                base_state, base_version = pending.base_state, pending.base_version
+                current_version = pending.version
+            else:
+                base_state, base_version = load_state()
+                current_version = base_version
+
+            if version is not None and version != current_version:
+                raise StateConflict(current_version)
+
+            self._pending = PendingState(
+                state=state,
+                version=current_version + 1,
+                base_state=base_state,
+                base_version=base_version,
+                saves=pending.saves + 1 if pending else 1,
+            )
+
+            if durable or not self.interval or self._pending.saves >= self.max_pending:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.interval, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+            return current_version + 1
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            pending, self._pending = self._pending, None
+            if pending is None:
+                return
+
+            try:
+                self._store(pending)
+            except Exception:
+                # keep hold of it so the next flush tries again
+                self._pending = pending
+                raise
+
+    def _store(self, pending):
+        try:
+            store_state(pending.state, version=pending.base_version, new_version=pending.version)
+            return
+        except StateConflict as conflict:
+            logger.warning("Rebasing the buffered state at version %s: %s", pending.version, conflict)
+
+        for _ in range(self.REBASE_ATTEMPTS):
+            current_state, current_version = load_state()
+            state = rebase(pending.base_state, pending.state, current_state)
+            # after every version handed out here and by the other process
+            new_version = max(pending.version, current_version) + 1
+            try:
+                store_state(state, version=current_version, new_version=new_version)
+            except StateConflict:
+                continue
+            if self.cache is not None:
+                self.cache.set(json.dumps(state), new_version)
+            return
+        raise StateConflict(load_version())
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # the timer runs in its own thread, which has its own connection
+            connections.close_all()
+
+
+state_buffer = StateWriteBuffer(
+    interval=getattr(settings, "ADAPT_STATE_FLUSH_INTERVAL", 1.0),
+    max_pending=getattr(settings, "ADAPT_STATE_MAX_PENDING", 100),
+    cache=state_cache,
+)
+
+
+def read_state(known_version=None):
+    """
+    Returns the current state, serialised, and its version.
+
+    If the current version is known_version the state is not modified so
+    None is returned in place of the state.
+    """
+    if known_version is not None and state_cache.get_version() == known_version:
+        return None, known_version
+
+    if (cached := state_cache.get()) is None:
+        # under the lock write_state saves under, so an older state read
+        # here cannot replace the state it caches
+        with state_buffer._lock:
+            if (cached := state_cache.get()) is None:
+                state, version = state_buffer.load()
+                cached = (json.dumps(state), version)
+                state_cache.fill(*cached)
+
+    state, version = cached
+    if version == known_version:
+        return None, version
+    return state, version
+
+
+def write_state(state, version=None, durable=False):
+    """
+    Saves the serialised state, returning the new version.
+    """
+    try:
+        parsed = json.loads(state)
+    except ValueError:
+        raise InvalidState("The state is not valid JSON")
+    with state_buffer._lock:
+        version = state_buffer.save(parsed, version, durable=durable)
+        state_cache.set(state, version)
+    return version
@@ -0,0 +1,47 @@
+import json
+
+from django.test import TestCase, TransactionTestCase
+
+from adapt.pages import page_cache
+from adapt.registry import ModelRegistry
+from adapt.state import state_cache
+from dummy.models import Address, Person
+
+
+class PeopleTestCase(TestCase):
+    """
+    p0 to p4, the first three living at the one address
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        address = Address.objects.create(post_code="ab1")
+        Person.objects.bulk_create([
+            Person(name=f"p{index}", age=str(index), gender="mf"[index % 2], address=address if index < 3 else None)
+            for index in range(5)
+        ])
+        cls.people = list(Person.objects.order_by("pk"))
+        cls.metadata = ModelRegistry([Person]).build().get(Person)
+
+
+class SchemaTestCase(TransactionTestCase):
+    """
+    The resolvers run in the db threads, which only see committed rows
+    """
+
+    def setUp(self):
+        page_cache.clear()
+        state_cache.clear()
+        self.addCleanup(page_cache.clear)
+        self.addCleanup(state_cache.clear)
+
+    def execute(self, query, **variables):
+        response = self.client.post(
+            "/api/graphql",
+            json.dumps({"query": query, "variables": variables}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertIsNone(result.get("errors"), result.get("errors"))
+        return result["data"]
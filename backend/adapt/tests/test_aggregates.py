@@ -0,0 +1,17 @@
+from adapt.graphql import build_table
+from adapt.tests.base import PeopleTestCase
+
+
+class AggregatedColumnTests(PeopleTestCase):
+
+    def test_columns(self):
+        self.assertEqual([column["field"] for column in self.metadata.aggregate_columns], ["friends"])
+
+    def test_aggregated_columns_do_not_query_per_row(self):
+        first, second, third = self.people[:3]
+        first.friends.set([second, third])
+        # the page, then the labels of every row at once
+        with self.assertNumQueries(2):
+            table = build_table(self.metadata, columns=["id", "friends"], cache=None)
+        self.assertEqual(table.values[0], [first.pk, {"count": 2, "labels": [str(second), str(third)]}])
+        self.assertEqual(table.values[3][1]["count"], 0)
@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase, TestCase
+
+from adapt.benchmarks import bench_state, compare
+from adapt.models import Adapt
+from adapt.state import load_state, state_cache, store_state
+from adapt.tests.test_state import make_state
+
+
+def results(**timings):
+    return {"results": {name: {"median_ms": ms, "stdev_ms": stdev} for name, (ms, stdev) in timings.items()}}
+
+
+class CompareTests(SimpleTestCase):
+
+    def test_regressions(self):
+        comparison = compare(
+            results(slower=(20.0, 0.5), jittery=(20.0, 8.0), fast=(0.5, 0.01), same=(10.0, 0.5)),
+            results(slower=(10.0, 0.5), jittery=(10.0, 1.0), fast=(0.2, 0.01), same=(10.0, 0.5)),
+        )
+        self.assertEqual(
+            {name: regressed for name, _, _, _, regressed in comparison},
+            # fast is over twice as slow but by less than a millisecond
+            {"slower": True, "jittery": False, "fast": False, "same": False},
+        )
+
+
+class BenchStateTests(TestCase):
+
+    def setUp(self):
+        state_cache.clear()
+        self.addCleanup(state_cache.clear)
+
+    def test_puts_back_the_state(self):
+        store_state(make_state(1))
+        results = bench_state(repeat=2, elements=3)
+        self.assertEqual(set(results), {"state.save", "state.load_cached", "state.load_uncached"})
+        self.assertEqual(load_state()[0], make_state(1))
+
+    def test_deletes_the_state_if_there_was_none(self):
+        bench_state(repeat=2, elements=3)
+        self.assertFalse(Adapt.objects.exists())
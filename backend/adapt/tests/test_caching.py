@@ -0,0 +1,63 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from adapt.caching import get_cache, get_local_cache
+from adapt.counts import CountCache, TotalCount
+from adapt.documents import PersistedQueries, PersistedQueryNotFound, get_query_hash
+from adapt.pages import PageCacheBackend
+from adapt.state import StateCache
+
+
+SHARED_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+}
+
+
+class GetCacheTests(SimpleTestCase):
+
+    def test_local_caches_are_kept_by_name(self):
+        self.assertIs(get_cache(None, "tests"), get_local_cache("tests"))
+        self.assertIsNot(get_local_cache("tests"), get_local_cache("other tests"))
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_alias(self):
+        self.assertIs(get_cache("shared", "tests"), caches["shared"])
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class SharedCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        caches["shared"].clear()
+        self.addCleanup(caches["shared"].clear)
+
+    def test_counts(self):
+        count_cache = CountCache(alias="shared")
+        count_cache.set("key", TotalCount(count=3, exact=True))
+        self.assertEqual(CountCache(alias="shared").get("key"), TotalCount(count=3, exact=True))
+        self.assertIsNone(CountCache(alias="shared").get("missing"))
+
+    def test_persisted_queries(self):
+        query = "{ models }"
+        query_hash = get_query_hash(query)
+        PersistedQueries(alias="shared").register(query_hash, query)
+        # as another process would, without the query in this one
+        get_local_cache("persisted_queries").clear()
+        self.assertEqual(PersistedQueries(alias="shared").get(query_hash), query)
+        with self.assertRaises(PersistedQueryNotFound):
+            PersistedQueries().get(get_query_hash("{ forms }"))
+
+    def test_state(self):
+        StateCache(alias="shared").set("{}", 3)
+        state_cache = StateCache(alias="shared")
+        self.assertEqual(state_cache.get(), ("{}", 3))
+        state_cache.fill("{}", 2)
+        self.assertEqual(state_cache.get_version(), 3)
+
+    def test_page_versions(self):
+        backend = PageCacheBackend(alias="shared")
+        [version] = backend.get_versions(["dummy.Person"])
+        backend.bump("dummy.Person")
+        self.assertEqual(PageCacheBackend(alias="shared").get_versions(["dummy.Person"]), [version + 1])
+
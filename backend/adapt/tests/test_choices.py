@@ -0,0 +1,58 @@
+from django.test import SimpleTestCase
+
+from adapt.choices import Choice, page_static_choices
+from adapt.pagination import PaginationError, encode_cursor
+from adapt.tests.base import SchemaTestCase
+from dummy.models import Address, Person
+
+
+CHOICES = [Choice(value=str(index), label=f"choice {index}") for index in range(5)]
+
+
+class StaticChoicesTests(SimpleTestCase):
+
+    def test_pages(self):
+        rows, page_info = page_static_choices(CHOICES, first=2)
+        self.assertEqual([choice.value for _, choice in rows], ["0", "1"])
+        self.assertTrue(page_info.has_next_page)
+
+        rows, page_info = page_static_choices(CHOICES, first=2, after=page_info.end_cursor)
+        self.assertEqual([choice.value for _, choice in rows], ["2", "3"])
+        self.assertTrue(page_info.has_previous_page)
+
+        rows, _ = page_static_choices(CHOICES, search="CHOICE 4")
+        self.assertEqual([choice.value for _, choice in rows], ["4"])
+
+    def test_invalid_cursors(self):
+        for cursor in [encode_cursor(["a"]), encode_cursor([-1]), encode_cursor([True]), encode_cursor([1.5]), "zz"]:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(PaginationError):
+                    page_static_choices(CHOICES, after=cursor)
+
+
+class ChoicesQueryTests(SchemaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.address = Address.objects.create(post_code="ab1")
+        self.people = [
+            Person.objects.create(name=f"p{index}", age=str(index), gender="m", address=self.address)
+            for index in range(3)
+        ]
+
+    def test_choices(self):
+        data = self.execute('{ choices(mutationName: "person_default", field: "gender") { choices { value label } } }')
+        self.assertEqual(
+            data["choices"]["choices"],
+            [{"value": "", "label": "---------"}, {"value": "m", "label": "Male"}, {"value": "f", "label": "Female"}],
+        )
+
+        data = self.execute("""{
+            first: choices(mutationName: "person_default", field: "spouse", first: 2) {
+                choices { value } pageInfo { hasNextPage endCursor }
+            }
+            address: choices(mutationName: "person_default", field: "address") { choices { value } }
+        }""")
+        self.assertEqual([choice["value"] for choice in data["first"]["choices"]], [str(person.pk) for person in self.people[:2]])
+        self.assertTrue(data["first"]["pageInfo"]["hasNextPage"])
+        self.assertEqual(data["address"]["choices"], [{"value": str(self.address.pk)}])
@@ -0,0 +1,63 @@
+import array
+
+import msgpack
+from django.test import SimpleTestCase
+
+from adapt.columnar import encode_table, pack_table
+from adapt.tests.base import SchemaTestCase
+from dummy.models import Person
+
+
+class ColumnarTests(SimpleTestCase):
+
+    def test_encode_table(self):
+        table = encode_table(
+            ["id", "gender", "name"],
+            ["integer", "string", "string"],
+            [(1, "f", "a"), (2, "m", None), (3, "f", "c"), (4, "f", "d")],
+        )
+        self.assertEqual(table["length"], 4)
+        id_column, gender, name = table["columns"]
+        self.assertEqual(id_column["values"], [1, 2, 3, 4])
+        self.assertIsNone(id_column["nulls"])
+        self.assertEqual((gender["dictionary"], gender["values"]), (["f", "m"], [0, 1, 0, 0]))
+        self.assertEqual((name["nulls"], name["values"]), (bytes([0b10]), ["a", "c", "d"]))
+
+    def test_pack_table(self):
+        table = encode_table(["id", "gender"], ["integer", "string"], [(1, "f"), (2, "m"), (3, "f"), (4, "f")])
+        unpacked = msgpack.unpackb(pack_table(table))
+        id_column, gender = unpacked["columns"]
+        self.assertEqual(id_column["packing"], "i32")
+        self.assertEqual(list(array.array("i", id_column["values"])), [1, 2, 3, 4])
+        self.assertEqual(gender["dictionary"], ["f", "m"])
+        self.assertEqual(gender["packing"], "u8")
+        self.assertEqual(list(gender["values"]), [0, 1, 0, 0])
+
+    def test_big_integers_are_packed_exactly(self):
+        big = 2 ** 53 + 1
+        table = encode_table(["id", "score"], ["integer", "float"], [(big, 0.5), (1, 1.5)])
+        id_column, score = msgpack.unpackb(pack_table(table))["columns"]
+        self.assertEqual(id_column["packing"], "i64")
+        self.assertEqual(list(array.array("q", id_column["values"])), [big, 1])
+        self.assertEqual(score["packing"], "f64")
+        self.assertEqual(list(array.array("d", score["values"])), [0.5, 1.5])
+
+
+class TableEndpointTests(SchemaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for index in range(3):
+            Person.objects.create(name=f"p{index}", age=str(index), gender="mf"[index % 2])
+
+    def test_msgpack_table(self):
+        response = self.client.get("/api/table/Person.msgpack", {"columns": "id,name", "first": "2"})
+        self.assertEqual(response["Content-Type"], "application/x-msgpack")
+        page = msgpack.unpackb(response.content)
+        self.assertEqual(page["length"], 2)
+        id_column, name = page["columns"]
+        self.assertEqual(len(array.array("i", id_column["values"])), 2)
+        self.assertEqual(name["values"], ["p0", "p1"])
+        self.assertTrue(page["pageInfo"]["hasNextPage"])
+
+        self.assertEqual(self.client.get("/api/table/Person.msgpack", {"after": "zz"}).status_code, 400)
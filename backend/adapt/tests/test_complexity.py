@@ -0,0 +1,76 @@
+from django.test import SimpleTestCase
+from graphql import parse
+
+from adapt.complexity import DEFAULT_LIST_SIZE, get_query_cost
+from adapt.pagination import MAX_PAGE_SIZE
+from api.schema import schema
+
+
+# what the frontend and the admin send, with every field selected
+OPERATIONS = {
+    "state": "{ state { version modified state } }",
+    "saveState": 'mutation { saveState(state: "{}") { success version } }',
+    "models": "{ models }",
+    "forms": "{ forms { mutationName choiceFields fields { name fieldType required isChoice } } }",
+    "table": f"""{{
+        table(model: person, first: {MAX_PAGE_SIZE}) {{
+            columns {{ name model field relatedModels type }}
+            pageInfo {{ hasNextPage hasPreviousPage startCursor endCursor }}
+            rows {{ cursor values cellValues }}
+            columnar {{ length columns {{ field type nulls dictionary values }} }}
+            totalCount {{ count exact }}
+        }}
+    }}""",
+    "choices": """{
+        choices(mutationName: "person_default", field: "address", first: 100) {
+            mutationName field choices { value label } pageInfo { hasNextPage endCursor }
+        }
+    }""",
+    "aggregate": """{
+        aggregate(model: person, groupBy: ["gender"], first: 100) {
+            columns { name type } rows truncated
+        }
+    }""",
+    "person_default": """mutation {
+        person_default(input: {name: "a", age: "1", gender: "f", friends: []}) {
+            response { id } errors { field messages }
+        }
+    }""",
+    "person_default_bulk": """mutation {
+        person_default_bulk(input: [{name: "a", age: "1", gender: "f", friends: []}]) {
+            response { id } errors { index errors { field messages } }
+        }
+    }""",
+}
+
+
+def get_cost(query):
+    return get_query_cost(schema._schema, parse(query))
+
+
+class QueryCostTests(SimpleTestCase):
+
+    def test_operations_are_within_the_budgets(self):
+        for name, query in OPERATIONS.items():
+            with self.subTest(name):
+                self.assertEqual(get_cost(query).get_errors(), [])
+
+    def test_only_pages_are_counted_many_times(self):
+        cost = get_cost("{ table(model: person, first: 10) { columns { name } rows { cellValues } } }")
+        # table, columns and its name, then 10 rows and their cellValues
+        self.assertEqual(cost.nodes, 1 + 1 + 1 + 10 + 10)
+
+        cost = get_cost("{ table(model: person) { rows { cursor } } }")
+        self.assertEqual(cost.nodes, 1 + DEFAULT_LIST_SIZE * 2)
+
+    def test_schema_bounded_lists_are_counted_once(self):
+        cost = get_cost(OPERATIONS["forms"])
+        # forms, its three fields and the four of fields
+        self.assertEqual(cost.nodes, 1 + 3 + 4)
+
+    def test_over_the_budget(self):
+        query = "{ " + " ".join(
+            f"t{index}: table(model: person, first: {MAX_PAGE_SIZE}) {{ rows {{ cursor }} }}"
+            for index in range(200)
+        ) + " }"
+        self.assertTrue(get_cost(query).get_errors())
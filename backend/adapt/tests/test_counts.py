@@ -0,0 +1,23 @@
+from adapt.counts import count_cache, count_rows, get_total_count
+from adapt.tests.base import PeopleTestCase
+from dummy.models import Person
+
+
+class CountTests(PeopleTestCase):
+
+    def test_total_count(self):
+        total_count = count_rows(Person.objects.all())
+        self.assertEqual((total_count.count, total_count.exact), (5, True))
+        # over the threshold it is the database's estimate, if it has one
+        total_count = count_rows(Person.objects.all(), threshold=3)
+        self.assertGreaterEqual(total_count.count, 3)
+        if total_count.exact:
+            self.assertEqual(total_count.count, 5)
+
+    def test_counts_are_cached(self):
+        count_cache.clear()
+        self.addCleanup(count_cache.clear)
+        queryset = Person.objects.filter(gender="f")
+        self.assertEqual(get_total_count(queryset).count, 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_total_count(queryset).count, 2)
@@ -0,0 +1,31 @@
+import json
+
+from adapt.tests.base import SchemaTestCase
+from dummy.models import Person
+
+
+class ExportTests(SchemaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for index in range(3):
+            Person.objects.create(name=f"p{index}", age=str(index), gender="mf"[index % 2])
+
+    def test_export(self):
+        response = self.client.get("/api/export/Person.csv", {"columns": "id,name", "search": "p1"})
+        self.assertEqual(response.status_code, 200)
+        pk = Person.objects.get(name="p1").pk
+        self.assertEqual(b"".join(response.streaming_content).decode(), f"id,name\r\n{pk},p1\r\n")
+
+        response = self.client.get("/api/export/Person.ndjson", {"columns": "name", "orderBy": '[{"field": "name", "direction": "DESC"}]'})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{"name": "p2"}, {"name": "p1"}, {"name": "p0"}])
+
+        for path, params in [
+            ("/api/export/Person.xml", {}),
+            ("/api/export/Nope.csv", {}),
+            ("/api/export/Person.csv", {"columns": "nope"}),
+            ("/api/export/Person.csv", {"filters": "[1]"}),
+        ]:
+            with self.subTest(path=path, params=params):
+                self.assertEqual(self.client.get(path, params).status_code, 400)
@@ -0,0 +1,51 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from adapt.filters import ColumnFilter, FilterError, OrderBy, SortDirection
+from adapt.graphql import build_table
+from adapt.tests.base import PeopleTestCase
+
+
+class FilterTests(PeopleTestCase):
+
+    def get_names(self, **kwargs):
+        table = build_table(self.metadata, columns=["name"], cache=None, **kwargs)
+        return [values[0] for values in table.values]
+
+    def test_filters_and_search(self):
+        self.assertEqual(self.get_names(filters=[ColumnFilter(field="gender", eq="f")]), ["p1", "p3"])
+        self.assertEqual(self.get_names(filters=[ColumnFilter(field="age", in_=["0", "4"])]), ["p0", "p4"])
+        self.assertEqual(self.get_names(filters=[ColumnFilter(field="address__id", isnull=True)]), ["p3", "p4"])
+        self.assertEqual(self.get_names(search="P1"), ["p1"])
+        with self.assertRaises(FilterError):
+            self.get_names(filters=[ColumnFilter(field="nope", eq="1")])
+        with self.assertRaises(FilterError):
+            self.get_names(filters=[ColumnFilter(field="id", contains="1")])
+
+    def test_pages_in_order(self):
+        order_by = [OrderBy(field="gender", direction=SortDirection.DESC)]
+        first = build_table(self.metadata, first=2, order_by=order_by, columns=["name"], cache=None)
+        rest = build_table(
+            self.metadata, after=first.page_info.end_cursor, order_by=order_by, columns=["name"], cache=None
+        )
+        # the primary key goes the same way as the last column
+        self.assertEqual(first.values + rest.values, [["p4"], ["p2"], ["p0"], ["p3"], ["p1"]])
+
+
+class ColumnSelectionTests(PeopleTestCase):
+
+    def test_only_the_columns_asked_for(self):
+        table = build_table(self.metadata, first=1, columns=["address__post_code", "id"], cache=None)
+        self.assertEqual([column.field for column in table.columns], ["address__post_code", "id"])
+        self.assertEqual(table.values, [["ab1", self.people[0].pk]])
+        with self.assertRaises(FilterError):
+            build_table(self.metadata, columns=["nope"], cache=None)
+
+    def test_only_the_relations_asked_for_are_joined(self):
+        with CaptureQueriesContext(connection) as queries:
+            build_table(self.metadata, columns=["name"], cache=None)
+        self.assertNotIn("JOIN", queries[0]["sql"])
+
+        with CaptureQueriesContext(connection) as queries:
+            build_table(self.metadata, columns=["name", "address__post_code"], cache=None)
+        self.assertEqual(queries[0]["sql"].count("JOIN"), 1)
@@ -0,0 +1,17 @@
+from adapt.graphql import create_default_model_form, get_form_metadata
+from adapt.tests.base import SchemaTestCase
+from dummy.models import Person
+
+
+class FormsTests(SchemaTestCase):
+
+    def test_form_metadata_is_worked_out_once(self):
+        form_class = create_default_model_form(Person)
+        self.assertIs(get_form_metadata(form_class), get_form_metadata(form_class))
+
+    def test_forms(self):
+        data = self.execute("{ forms { mutationName choiceFields fields { name required isChoice } } }")
+        [form] = data["forms"]
+        self.assertEqual(form["mutationName"], "person_default")
+        self.assertIn("friends", form["choiceFields"])
+        self.assertIn({"name": "friends", "required": True, "isChoice": True}, form["fields"])
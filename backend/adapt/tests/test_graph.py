@@ -0,0 +1,118 @@
+import importlib.util
+
+from django.db import models
+from django.db.models import Field
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import isolate_apps
+
+from adapt.graph import ModelGraph, get_related_field_name
+from dummy.models import Person
+
+
+def get_recursive_columns(model, related_models=(), path=()):
+    """
+    How the columns were worked out before ModelGraph
+    """
+    columns = []
+    for field in model._meta.get_fields():
+        if related_model := field.related_model:
+            if isinstance(field, Field) and not field.many_to_many and related_model not in related_models:
+                columns += get_recursive_columns(
+                    related_model, (*related_models, related_model), (*path, get_related_field_name(field))
+                )
+        else:
+            columns.append({
+                "name": field.name,
+                "model": model.__name__,
+                "field": "__".join((*path, field.name)),
+                "related_models": [related_model.__name__ for related_model in related_models],
+            })
+    return columns
+
+
+def get_fields(columns):
+    return [column["field"] for column in columns]
+
+
+class ModelGraphTests(SimpleTestCase):
+
+    def setUp(self):
+        isolation = isolate_apps("adapt")
+        isolation.enable()
+        self.addCleanup(isolation.disable)
+
+        # a diamond, Top -> Left -> Bottom and Top -> Right -> Bottom
+        class Bottom(models.Model):
+            code = models.CharField(max_length=3)
+
+        class Left(models.Model):
+            bottom = models.ForeignKey(Bottom, on_delete=models.CASCADE)
+
+        class Right(models.Model):
+            bottom = models.ForeignKey(Bottom, on_delete=models.CASCADE)
+
+        class Top(models.Model):
+            left = models.ForeignKey(Left, on_delete=models.CASCADE)
+            right = models.ForeignKey(Right, on_delete=models.CASCADE)
+
+        class Node(models.Model):
+            name = models.CharField(max_length=3)
+            parent = models.ForeignKey("self", on_delete=models.CASCADE, null=True)
+
+        self.Bottom, self.Top, self.Node = Bottom, Top, Node
+
+    def test_same_columns_as_the_recursive_walk(self):
+        for model in [Person, self.Top, self.Node]:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(ModelGraph().get_columns(model), get_recursive_columns(model))
+        self.assertEqual(len(ModelGraph().get_columns(Person)), 18)
+
+    def test_diamond(self):
+        graph = ModelGraph()
+        self.assertEqual(get_fields(graph.get_columns(self.Top)), [
+            "id",
+            "left__id", "left__bottom__id", "left__bottom__code",
+            "right__id", "right__bottom__id", "right__bottom__code",
+        ])
+        # Bottom is reached along two paths but only walked once
+        self.assertEqual(len([key for key in graph._subgraphs if key[0] is self.Bottom]), 1)
+
+    def test_self_reference(self):
+        columns = ModelGraph().get_columns(self.Node)
+        self.assertEqual(get_fields(columns), ["id", "name", "parent__id", "parent__name"])
+        self.assertEqual(columns[2]["related_models"], ["Node"])
+
+    def test_ancestors_which_cannot_be_reached_are_not_in_the_key(self):
+        graph = ModelGraph()
+        graph.get_columns(self.Top)
+        self.assertIn((self.Bottom, None, frozenset()), graph._subgraphs)
+
+        graph.get_columns(self.Node)
+        # the Node below the root can reach Node again, so that is remembered
+        self.assertIn((self.Node, None, frozenset({self.Node})), graph._subgraphs)
+
+    def test_max_join_depth(self):
+        self.assertEqual(get_fields(ModelGraph(max_depth=0).get_columns(self.Top)), ["id"])
+        self.assertEqual(
+            get_fields(ModelGraph(max_depth=1).get_columns(self.Top)), ["id", "left__id", "right__id"]
+        )
+        columns = ModelGraph(max_depth=1).get_columns(Person)
+        self.assertNotIn("work__address__post_code", get_fields(columns))
+        self.assertIn("work__id", get_fields(columns))
+
+    def test_max_join_depths_override_the_max_join_depth(self):
+        graph = ModelGraph(max_depth=0, max_depths={self.Top._meta.label: 1})
+        self.assertEqual(get_fields(graph.get_columns(self.Top)), ["id", "left__id", "right__id"])
+        self.assertEqual(get_fields(graph.get_columns(self.Node)), ["id", "name"])
+
+        graph = ModelGraph(max_depth=1, max_depths={self.Top._meta.label: None})
+        self.assertEqual(graph.get_columns(self.Top), get_recursive_columns(self.Top))
+
+    @override_settings(ADAPT_MAX_JOIN_DEPTH=1, ADAPT_MAX_JOIN_DEPTHS={"dummy.Person": 2})
+    def test_settings(self):
+        # a fresh copy of the module, so model_graph is made with these settings
+        spec = importlib.util.find_spec("adapt.graph")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.assertEqual(module.model_graph.get_max_depth(self.Top), 1)
+        self.assertEqual(module.model_graph.get_max_depth(Person), 2)
@@ -0,0 +1,34 @@
+from django.test import TestCase
+
+from adapt.grouping import AggregateFunction, Measure, build_aggregate
+from adapt.registry import ModelRegistry
+from dummy.models import Address, Person
+
+
+class AggregateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        address = Address.objects.create(post_code="ab1")
+        Person.objects.bulk_create([
+            Person(name=f"p{index}", age=str(index), gender="mf"[index % 2], address=address if index < 3 else None)
+            for index in range(5)
+        ])
+        cls.metadata = ModelRegistry([Person]).build().get(Person)
+
+    def test_group_by(self):
+        result = build_aggregate(self.metadata, group_by=["gender"])
+        self.assertEqual([column.name for column in result.columns], ["gender", "count"])
+        self.assertEqual(result.rows, [["f", 2], ["m", 3]])
+        self.assertFalse(result.truncated)
+
+    def test_number_measures_keep_their_types(self):
+        ids = list(Person.objects.values_list("pk", flat=True))
+        result = build_aggregate(self.metadata, measures=[
+            Measure(function=function, field="id")
+            for function in (AggregateFunction.SUM, AggregateFunction.MIN, AggregateFunction.MAX, AggregateFunction.AVG)
+        ])
+        [row] = result.rows
+        self.assertEqual(row, [sum(ids), min(ids), max(ids), sum(ids) / len(ids)])
+        self.assertEqual([type(value) for value in row], [int, int, int, float])
+        self.assertEqual([column.type for column in result.columns], ["integer", "integer", "integer", "float"])
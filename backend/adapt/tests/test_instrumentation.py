@@ -0,0 +1,37 @@
+from asgiref.sync import async_to_sync
+from django.test import TransactionTestCase, override_settings
+
+from adapt.graphql import Registration
+from adapt.pages import page_cache
+from dummy.models import Person
+
+
+class ResolverProfilerTests(TransactionTestCase):
+    """
+    The resolvers run in the db threads, which only see committed rows
+    """
+
+    @override_settings(ADAPT_PROFILE_RESOLVERS=True, DEBUG=True)
+    def test_table_is_profiled(self):
+        self.addCleanup(page_cache.clear)
+        for index in range(2):
+            Person.objects.create(name=f"p{index}", age=str(index), gender="m")
+        schema = Registration([Person])["schema"]
+
+        result = async_to_sync(schema.execute)(
+            'query ProfiledTable { table(model: person, columns: ["name"]) { rows { values } } }'
+        )
+        self.assertIsNone(result.errors)
+        profile = result.extensions["resolvers"]["table"]
+        self.assertEqual(profile["field"], "table")
+        self.assertEqual(profile["rows"], 2)
+        self.assertGreaterEqual(profile["sql"]["queries"], 1)
+        self.assertGreater(profile["bytes"], 0)
+
+        metrics = self.client.get("/api/metrics").content.decode()
+        labels = 'operation="ProfiledTable",field="table"'
+        self.assertIn(f"adapt_resolver_seconds_count{{{labels}}} 1", metrics)
+        self.assertIn(f'adapt_resolver_rows_bucket{{{labels},le="1"}} 0', metrics)
+        self.assertIn(f'adapt_resolver_rows_bucket{{{labels},le="10"}} 1', metrics)
+        self.assertIn(f"adapt_resolver_sql_queries_count{{{labels}}} 1", metrics)
+        self.assertIn(f"adapt_resolver_bytes_count{{{labels}}} 1", metrics)
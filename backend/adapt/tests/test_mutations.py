@@ -0,0 +1,144 @@
+from django.test import TestCase
+
+from adapt.graphql import build_table, create_default_model_form, get_form_input
+from adapt.mutations import bulk_save_forms, save_form
+from adapt.pages import page_cache
+from adapt.registry import ModelRegistry
+from adapt.tests.base import SchemaTestCase
+from dummy.models import Address, Person
+
+
+PersonForm = create_default_model_form(Person)
+PersonInput = get_form_input(Person, PersonForm)
+
+
+class PersonFormTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # friends is required
+        cls.friend = Person.objects.create(name="friend", age="1", gender="m")
+
+    def person(self, **kwargs):
+        return PersonInput(**{"name": "p", "age": "30", "gender": "f", "friends": [str(self.friend.pk)], **kwargs})
+
+
+class BulkSaveFormsTests(PersonFormTestCase):
+
+    def test_creates_and_updates(self):
+        existing = Person.objects.create(name="a", age="1", gender="m")
+        address = Address.objects.create(post_code="ab1")
+
+        instances, errors = bulk_save_forms(PersonForm, [
+            self.person(name="b", address=str(address.pk)),
+            self.person(id=str(existing.pk), name="c", friends=[str(existing.pk)]),
+        ])
+        self.assertIsNone(errors)
+        self.assertEqual([instance.name for instance in instances], ["b", "c"])
+        self.assertEqual(Person.objects.get(name="b").address, address)
+        self.assertEqual(list(Person.objects.get(name="c").friends.all()), [existing])
+
+    def test_nothing_is_saved_if_an_input_is_invalid(self):
+        instances, errors = bulk_save_forms(PersonForm, [self.person(), self.person(gender="x")])
+        self.assertIsNone(instances)
+        self.assertEqual([index for index, _ in errors], [1])
+        self.assertFalse(Person.objects.exclude(pk=self.friend.pk).exists())
+
+    def test_malformed_choices_are_invalid_choices(self):
+        address = Address.objects.create(post_code="ab1")
+        instances, errors = bulk_save_forms(PersonForm, [
+            self.person(address=str(address.pk)),
+            self.person(address="abc"),
+            self.person(friends=["abc"]),
+        ])
+        self.assertIsNone(instances)
+        self.assertEqual(errors[0][0], 1)
+        self.assertEqual(errors[0][1].as_data()["address"][0].code, "invalid_choice")
+        self.assertEqual(errors[1][0], 2)
+        self.assertEqual(errors[1][1].as_data()["friends"][0].code, "invalid_choice")
+
+    def test_unknown_ids_are_form_errors(self):
+        instances, errors = bulk_save_forms(PersonForm, [self.person(id="0"), self.person(id="abc")])
+        self.assertIsNone(instances)
+        self.assertEqual(errors, [
+            (0, {"id": ["Person 0 does not exist"]}),
+            (1, {"id": ["Person abc does not exist"]}),
+        ])
+
+    def test_unique_fields_are_checked_across_the_inputs(self):
+        instances, errors = bulk_save_forms(PersonForm, [
+            self.person(spouse=str(self.friend.pk)),
+            self.person(spouse=str(self.friend.pk)),
+        ])
+        self.assertIsNone(instances)
+        self.assertEqual([index for index, _ in errors], [1])
+        self.assertIn("spouse", errors[0][1])
+
+    def test_unique_fields_are_checked_against_the_database(self):
+        married = Person.objects.create(name="a", age="1", gender="m", spouse=self.friend)
+        instances, errors = bulk_save_forms(PersonForm, [
+            self.person(),
+            self.person(spouse=str(self.friend.pk)),
+        ])
+        self.assertIsNone(instances)
+        self.assertEqual([index for index, _ in errors], [1])
+        self.assertIn("spouse", errors[0][1])
+
+        # but an instance can keep its own value
+        instances, errors = bulk_save_forms(PersonForm, [
+            self.person(id=str(married.pk), name="b", spouse=str(self.friend.pk)),
+        ])
+        self.assertIsNone(errors)
+        self.assertEqual(Person.objects.get(pk=married.pk).name, "b")
+
+    def test_invalidates_the_cached_pages(self):
+        other = Person.objects.create(name="other", age="1", gender="f")
+        metadata = ModelRegistry([Person]).build().get(Person)
+        page_cache.watch(metadata)
+        self.addCleanup(page_cache.clear)
+        columns = ["id", "friends"]
+        self.assertEqual(len(build_table(metadata, columns=columns, cache=page_cache).values), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            instances, _ = bulk_save_forms(PersonForm, [self.person()])
+        self.assertEqual(len(build_table(metadata, columns=columns, cache=page_cache).values), 3)
+
+        # only the through table changes
+        bulk_save_forms(PersonForm, [self.person(id=str(instances[0].pk), friends=[str(other.pk)])])
+        values = build_table(metadata, columns=columns, cache=page_cache).values
+        self.assertEqual(values[1], [other.pk, {"count": 1, "labels": [str(instances[0])]}])
+
+
+class SaveFormTests(PersonFormTestCase):
+
+    def test_saves(self):
+        instance, errors = save_form(PersonForm, self.person(name="a"))
+        self.assertIsNone(errors)
+        self.assertEqual(instance, Person.objects.get(name="a"))
+
+    def test_unknown_id_is_a_form_error(self):
+        for instance_id in ["0", "abc"]:
+            with self.subTest(instance_id=instance_id):
+                instance, errors = save_form(PersonForm, self.person(id=instance_id))
+                self.assertIsNone(instance)
+                self.assertEqual(errors, {"id": [f"Person {instance_id} does not exist"]})
+
+
+class MutationQueryTests(SchemaTestCase):
+
+    def test_mutation(self):
+        friend = Person.objects.create(name="friend", age="1", gender="m")
+        data = self.execute("""mutation ($friend: ID!) {
+            person_default(input: {name: "new", age: "1", gender: "f", friends: [$friend]}) {
+                response { id } errors { field messages }
+            }
+        }""", friend=str(friend.pk))
+        self.assertIsNone(data["person_default"]["errors"])
+        self.assertTrue(Person.objects.filter(name="new", friends=friend).exists())
+
+        data = self.execute("""mutation {
+            person_default(input: {name: "new", age: "1", gender: "x", friends: ["abc"]}) {
+                response { id } errors { field messages }
+            }
+        }""")
+        self.assertEqual({error["field"] for error in data["person_default"]["errors"]}, {"gender", "friends"})
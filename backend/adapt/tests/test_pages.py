@@ -0,0 +1,30 @@
+from adapt.graphql import build_table
+from adapt.pages import page_cache
+from adapt.tests.base import PeopleTestCase
+
+
+class PageCacheTests(PeopleTestCase):
+
+    def setUp(self):
+        page_cache.watch(self.metadata)
+        page_cache.clear()
+        self.addCleanup(page_cache.clear)
+
+    def test_cached_pages_are_invalidated_by_saves(self):
+        build_table(self.metadata, columns=["name"])
+        with self.assertNumQueries(0):
+            build_table(self.metadata, columns=["name"])
+
+        self.people[0].name = "renamed"
+        self.people[0].save()
+        self.assertEqual(build_table(self.metadata, columns=["name"]).values[0], ["renamed"])
+
+    def test_counters_are_served_as_metrics(self):
+        build_table(self.metadata, columns=["name"])
+        hits = page_cache.get_stats()["hits"]
+        build_table(self.metadata, columns=["name"])
+        self.assertEqual(page_cache.get_stats()["hits"], hits + 1)
+
+        response = self.client.get("/api/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f"adapt_page_cache_hits_total {hits + 1}\n", response.content.decode())
@@ -0,0 +1,34 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from adapt.pagination import PaginationError, decode_cursor, encode_cursor, paginate
+
+
+class PaginateTests(TestCase):
+
+    def test_pages_past_values_within_a_millisecond(self):
+        joined = timezone.now().replace(microsecond=0)
+        for index in range(3):
+            User.objects.create(
+                username=f"u{index}", date_joined=joined + datetime.timedelta(microseconds=index + 1)
+            )
+        ordering = [("date_joined", False), ("pk", False)]
+
+        names = []
+        after = None
+        for _ in range(4):
+            rows, page_info = paginate(User.objects.all(), ["username"], ordering, first=1, after=after)
+            names += [values[0] for _, values in rows]
+            after = page_info.end_cursor
+        self.assertEqual(names, ["u0", "u1", "u2"])
+
+    def test_cursors_are_decoded_to_the_field_types(self):
+        joined = timezone.now()
+        cursor = encode_cursor([joined, 1])
+        ordering = [("date_joined", False), ("pk", False)]
+        self.assertEqual(decode_cursor(cursor, ordering, User), [joined, 1])
+        with self.assertRaises(PaginationError):
+            decode_cursor(encode_cursor(["abc", 1]), ordering, User)
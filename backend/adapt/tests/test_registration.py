@@ -0,0 +1,56 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from adapt import graphql
+from adapt.graphql import LazySchema, Registration, register, registrations, warm_schemas
+from dummy.models import Person
+
+
+class RegistrationTests(SimpleTestCase):
+
+    def test_schema_is_built_when_first_used(self):
+        registration = Registration([Person])
+        schema = registration["schema"]
+        self.assertIsInstance(schema, LazySchema)
+        self.assertFalse(registration.is_built)
+
+        self.assertIn("type Query", schema.as_str())
+        self.assertTrue(registration.is_built)
+        self.assertEqual(list(registration["registry"]), [Person])
+
+    def test_warm_schemas(self):
+        registration = register([Person])
+        self.addCleanup(registrations.remove, registration)
+        self.assertFalse(registration.is_built)
+        warm_schemas()
+        self.assertTrue(registration.is_built)
+
+    def test_schema_is_built_once_across_threads(self):
+        build_schema = graphql.build_schema
+
+        def slow_build_schema(django_models):
+            # long enough for every thread to be waiting on the build
+            time.sleep(0.05)
+            return build_schema(django_models)
+
+        registration = Registration([Person])
+        barrier = threading.Barrier(4)
+        built = []
+
+        def build():
+            barrier.wait()
+            built.append(registration.build())
+
+        with mock.patch("adapt.graphql.build_schema", side_effect=slow_build_schema) as mock_build_schema:
+            threads = [threading.Thread(target=build) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(mock_build_schema.call_count, 1)
+        self.assertEqual(len(built), 4)
+        self.assertTrue(all(result is built[0] for result in built))
@@ -0,0 +1,33 @@
+from adapt.tests.base import SchemaTestCase
+from dummy.models import Address, Person
+
+
+class QueryTests(SchemaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.address = Address.objects.create(post_code="ab1")
+        self.people = [
+            Person.objects.create(name=f"p{index}", age=str(index), gender="mf"[index % 2], address=self.address)
+            for index in range(3)
+        ]
+
+    def test_table(self):
+        data = self.execute("""{
+            table(model: person, first: 2, columns: ["name", "address__post_code"]) {
+                columns { field type }
+                rows { cursor values cellValues }
+                pageInfo { hasNextPage endCursor }
+                totalCount { count exact }
+            }
+        }""")["table"]
+        self.assertEqual(data["columns"], [{"field": "name", "type": "string"}, {"field": "address__post_code", "type": "string"}])
+        self.assertEqual([row["values"] for row in data["rows"]], [["p0", "ab1"], ["p1", "ab1"]])
+        self.assertTrue(data["pageInfo"]["hasNextPage"])
+        self.assertEqual(data["totalCount"], {"count": 3, "exact": True})
+
+        data = self.execute(
+            'query ($after: String) { table(model: person, after: $after, columns: ["name"]) { rows { values } } }',
+            after=data["pageInfo"]["endCursor"],
+        )["table"]
+        self.assertEqual(data["rows"], [{"values": ["p2"]}])
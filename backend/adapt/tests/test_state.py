@@ -0,0 +1,143 @@
+import json
+
+from django.test import TestCase
+
+from adapt.models import Adapt, AdaptStateDelta
+from adapt.state import (
+    COMPACT_AFTER,
+    InvalidState,
+    StateCache,
+    StateWriteBuffer,
+    load_state,
+    rebase,
+    store_state,
+    write_state,
+)
+from adapt.tests.base import SchemaTestCase
+
+
+def make_state(number):
+    return {"devtoolsPosition": "right", "elements": [{"id": number}], "elementInView": None}
+
+
+class StoreStateTests(TestCase):
+
+    def test_versions_and_patches(self):
+        self.assertEqual(store_state(make_state(1)), 1)
+        self.assertEqual(store_state(make_state(2), version=1), 2)
+        self.assertEqual(load_state(), (make_state(2), 2))
+        self.assertEqual(AdaptStateDelta.objects.count(), 1)
+
+    def test_unchanged_state_keeps_the_version(self):
+        store_state(make_state(1))
+        self.assertEqual(store_state(make_state(1)), 1)
+        self.assertEqual(AdaptStateDelta.objects.count(), 0)
+
+    def test_version_jumps_do_not_compact(self):
+        # the buffer writes many saves as one, jumping the version
+        store_state(make_state(0))
+        store_state(make_state(1), new_version=COMPACT_AFTER * 2)
+        store_state(make_state(2), new_version=COMPACT_AFTER * 4)
+        adapt = Adapt.objects.get()
+        self.assertEqual(adapt.snapshot_version, 1)
+        self.assertEqual(AdaptStateDelta.objects.count(), 2)
+        self.assertEqual(load_state(), (make_state(2), COMPACT_AFTER * 4))
+
+    def test_compacts_after_enough_patches(self):
+        store_state(make_state(0))
+        for number in range(1, COMPACT_AFTER):
+            store_state(make_state(number))
+        self.assertEqual(AdaptStateDelta.objects.count(), COMPACT_AFTER - 1)
+
+        store_state(make_state(COMPACT_AFTER))
+        adapt = Adapt.objects.get()
+        self.assertEqual(AdaptStateDelta.objects.count(), 0)
+        self.assertEqual(adapt.snapshot_version, adapt.version)
+        self.assertEqual(load_state(), (make_state(COMPACT_AFTER), COMPACT_AFTER + 1))
+
+
+class WriteStateTests(TestCase):
+
+    def test_state_must_be_json(self):
+        with self.assertRaisesMessage(InvalidState, "The state is not valid JSON"):
+            write_state("not json", durable=True)
+        self.assertFalse(Adapt.objects.exists())
+
+        response = self.client.post(
+            "/api/graphql",
+            json.dumps({"query": 'mutation { saveState(state: "not json") { success version } }'}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["errors"][0]["message"], "The state is not valid JSON")
+
+
+class StateWriteBufferTests(TestCase):
+
+    def setUp(self):
+        self.cache = StateCache()
+        # flushed by hand
+        self.buffer = StateWriteBuffer(interval=60, cache=self.cache)
+        self.addCleanup(self.buffer.flush)
+
+    def test_saves_are_written_once_flushed(self):
+        store_state(make_state(0))
+        self.assertEqual(self.buffer.save(make_state(1), version=1), 2)
+        self.assertEqual(self.buffer.save(make_state(2), version=2), 3)
+        self.assertEqual(load_state(), (make_state(0), 1))
+
+        self.buffer.flush()
+        self.assertEqual(load_state(), (make_state(2), 3))
+
+    def test_conflicting_write_is_rebased(self):
+        store_state(make_state(0))
+        self.buffer.save({**make_state(0), "devtoolsPosition": "left"}, version=1)
+        # another process saves before the buffer is flushed
+        store_state(make_state(1), version=1)
+
+        self.buffer.flush()
+        state, version = load_state()
+        self.assertEqual(state, {**make_state(1), "devtoolsPosition": "left"})
+        self.assertEqual(version, 3)
+        self.assertEqual(self.cache.get()[1], 3)
+
+    def test_rebase_drops_changes_to_removed_parts(self):
+        base = {"elements": [{"id": 1, "name": "a"}]}
+        state = {"elements": [{"id": 1, "name": "b"}]}
+        self.assertEqual(rebase(base, state, {"elements": []}), {"elements": []})
+
+
+class StateCacheTests(TestCase):
+
+    def setUp(self):
+        # the local cache is shared with state_cache
+        StateCache().clear()
+        self.addCleanup(StateCache().clear)
+
+    def test_fill_keeps_a_newer_version(self):
+        cache = StateCache()
+        cache.set("new", 3)
+        cache.fill("old", 2)
+        self.assertEqual(cache.get(), ("new", 3))
+        cache.fill("newer", 4)
+        self.assertEqual(cache.get(), ("newer", 4))
+
+    def test_an_evicted_state_is_filled_in_again(self):
+        StateCache().set("state", 1)
+        StateCache().cache.delete(StateCache.STATE_KEY.format(version=1))
+        self.assertIsNone(StateCache().get())
+        StateCache().fill("state", 1)
+        self.assertEqual(StateCache().get(), ("state", 1))
+
+
+class StateQueryTests(SchemaTestCase):
+
+    def test_conditional_reads_and_conflicts(self):
+        data = self.execute("{ state { version modified state } }")["state"]
+        self.assertEqual((data["version"], data["modified"]), (0, True))
+
+        save = "mutation ($state: String!, $version: Int) { saveState(state: $state, version: $version, durable: true) { success version } }"
+        self.assertEqual(self.execute(save, state='{"elements": []}', version=0)["saveState"], {"success": True, "version": 1})
+        self.assertEqual(self.execute(save, state='{"elements": [1]}', version=0)["saveState"], {"success": False, "version": 1})
+
+        data = self.execute("query ($version: Int) { state(version: $version) { version modified state } }", version=1)
+        self.assertEqual(data["state"], {"version": 1, "modified": False, "state": None})
@@ -0,0 +1,35 @@
+from adapt.graphql import Row, build_table
+from adapt.grouping import build_aggregate
+from adapt.instrumentation import get_rows
+from adapt.pagination import PaginationError
+from adapt.tests.base import PeopleTestCase
+
+
+class TableTests(PeopleTestCase):
+
+    def test_pages_forwards_and_backwards(self):
+        table = build_table(self.metadata, first=2, columns=["name"], cache=None)
+        self.assertEqual(table.values, [["p0"], ["p1"]])
+        self.assertTrue(table.page_info.has_next_page)
+
+        table = build_table(self.metadata, first=2, after=table.page_info.end_cursor, columns=["name"], cache=None)
+        self.assertEqual(table.values, [["p2"], ["p3"]])
+
+        table = build_table(self.metadata, last=2, before=table.page_info.start_cursor, columns=["name"], cache=None)
+        self.assertEqual(table.values, [["p0"], ["p1"]])
+        self.assertFalse(table.page_info.has_previous_page)
+
+    def test_bad_pages(self):
+        with self.assertRaises(PaginationError):
+            build_table(self.metadata, after="zz", cache=None)
+        with self.assertRaises(PaginationError):
+            build_table(self.metadata, first=-1, cache=None)
+
+    def test_rows_are_counted_for_the_profile(self):
+        table = build_table(self.metadata, first=3, cache=None)
+        self.assertEqual(get_rows(table), 3)
+        self.assertEqual(get_rows(build_aggregate(self.metadata, group_by=["gender"])), 2)
+
+    def test_cell_values_are_never_null(self):
+        row = Row(cursor="", values=[1, None, "a", {"count": 2}])
+        self.assertEqual(row.cellValues(), ["1", "", "a", '{"count": 2}'])
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from django.test import SimpleTestCase
+
+from adapt.threads import iterate_in_db_thread
+
+
+def numbers(count, fail=False):
+    for number in range(count):
+        yield number, threading.current_thread().name
+    if fail:
+        raise ValueError("failed")
+
+
+class IterateInDbThreadTests(SimpleTestCase):
+
+    def test_iterate(self):
+        items = list(iterate_in_db_thread(numbers, 10))
+        self.assertEqual([number for number, _ in items], list(range(10)))
+        self.assertTrue(all(name.startswith("adapt-stream") for _, name in items))
+
+    def test_iterate_asynchronously(self):
+        async def collect():
+            return [number async for number, _ in iterate_in_db_thread(numbers, 10, maxsize=2)]
+        self.assertEqual(asyncio.run(collect()), list(range(10)))
+
+    def test_errors_are_raised(self):
+        with self.assertRaises(ValueError):
+            list(iterate_in_db_thread(numbers, 3, fail=True))
+
+        async def collect():
+            return [number async for number in iterate_in_db_thread(numbers, 3, fail=True)]
+        with self.assertRaises(ValueError):
+            asyncio.run(collect())
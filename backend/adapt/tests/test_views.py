@@ -0,0 +1,60 @@
+import json
+
+from django.test import TestCase
+
+from adapt.documents import get_query_hash, persisted_queries
+
+
+QUERY = "{ models }"
+
+
+class PersistedQueryGraphQLViewTests(TestCase):
+
+    def post(self, data):
+        return self.client.post("/api/graphql", json.dumps(data), content_type="application/json")
+
+    def test_query(self):
+        response = self.post({"query": QUERY})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"], {"models": ["person"]})
+
+    def test_syntax_error_is_a_graphql_error(self):
+        response = self.post({"query": "{ models"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["data"])
+        self.assertIn("Syntax Error", response.json()["errors"][0]["message"])
+
+    def test_persisted_query(self):
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": get_query_hash(QUERY)}}
+        response = self.post({"extensions": extensions})
+        self.assertEqual(
+            response.json()["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND"
+        )
+
+        self.post({"query": QUERY, "extensions": extensions})
+        self.assertEqual(persisted_queries.get(get_query_hash(QUERY)), QUERY)
+        response = self.client.get("/api/graphql", {"extensions": json.dumps(extensions)})
+        self.assertEqual(response.json()["data"], {"models": ["person"]})
+
+    def test_hash_mismatch(self):
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}}
+        response = self.post({"query": QUERY, "extensions": extensions})
+        self.assertEqual(
+            response.json()["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_HASH_MISMATCH"
+        )
+
+    def test_malformed_requests_are_bad_requests(self):
+        for data in [
+            [QUERY],
+            {"query": QUERY, "extensions": ["persistedQuery"]},
+            {"query": QUERY, "extensions": {"persistedQuery": "abc"}},
+            {"query": QUERY, "extensions": {"persistedQuery": {"sha256Hash": 1}}},
+            {"query": 1, "extensions": {"persistedQuery": {"sha256Hash": "abc"}}},
+        ]:
+            with self.subTest(data=data):
+                self.assertEqual(self.post(data).status_code, 400)
+
+        response = self.client.get("/api/graphql", {"query": QUERY, "extensions": "{"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/graphql", "{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
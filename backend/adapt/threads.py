@@ -0,0 +1,154 @@
+import asyncio
+import contextvars
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from adapt.instrumentation import count_sql, get_sql_counters
+
+
+'''
+
+The resolvers are async so one worker can serve many requests while they wait
+on the database.  The ORM is sync only though, so the ORM work is handed to a
+bounded pool of threads.  ADAPT_DB_THREADS is the size of the pool, which also
+caps how many connections a worker opens.
+
+iterate_in_db_thread is for streaming responses, which django iterates over in
+the event loop when served over ASGI, where the ORM cannot be used.  The
+generator runs in one of ADAPT_STREAM_THREADS threads of its own.  Django 4.2
+on iterates over it asynchronously.  Before that django iterates over streaming
+responses synchronously, even over ASGI, so the wait for each item blocks the
+event loop however the iterator is written.
+
+'''
+
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "ADAPT_DB_THREADS", 10),
+    thread_name_prefix="adapt-db",
+)
+
+# streaming responses hold their thread until the client has everything, so
+# they have their own threads rather than keep the resolvers waiting
+stream_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "ADAPT_STREAM_THREADS", 4),
+    thread_name_prefix="adapt-stream",
+)
+
+
+def _call_in_db_thread(func, *args, **kwargs):
+    # each thread has its own connections, and nothing else will tidy them up
+    close_old_connections()
+    try:
+        if counters := get_sql_counters():
+            with count_sql(*counters):
+                return func(*args, **kwargs)
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor,
+        functools.partial(context.run, _call_in_db_thread, func, *args, **kwargs),
+    )
+
+
+_DONE = object()
+
+
+class DbThreadIterator:
+    """
+    Iterates over the generator func(*args, **kwargs) in a thread of
+    stream_executor, which gets at most maxsize items ahead.  If the
+    iteration is stopped early (e.g. the client goes away) so is the
+    generator.
+
+    It can be iterated over asynchronously, which waits for each item
+    without blocking the event loop, or not.
+    """
+
+    def __init__(self, func, *args, maxsize=4, **kwargs):
+        self.func = functools.partial(func, *args, **kwargs)
+        self.maxsize = maxsize
+        self._stopped = threading.Event()
+
+    def _start(self, put):
+        def produce():
+            try:
+                for item in self.func():
+                    if not put(item):
+                        return
+            except Exception as error:
+                put(_DONE, error)
+            else:
+                put(_DONE)
+
+        context = contextvars.copy_context()
+        stream_executor.submit(context.run, _call_in_db_thread, produce)
+
+    def __iter__(self):
+        items = queue.Queue(maxsize=self.maxsize)
+
+        def put(item, error=None):
+            while not self._stopped.is_set():
+                try:
+                    items.put((item, error), timeout=1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        self._start(put)
+        try:
+            while True:
+                item, error = items.get()
+                if item is _DONE:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            self._stopped.set()
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        # the room left in items, which only the event loop can look at
+        room = threading.Semaphore(self.maxsize)
+
+        def put(item, error=None):
+            while not self._stopped.is_set():
+                if room.acquire(timeout=1):
+                    try:
+                        loop.call_soon_threadsafe(items.put_nowait, (item, error))
+                    except RuntimeError:
+                        # the loop has closed
+                        return False
+                    return True
+            return False
+
+        self._start(put)
+        try:
+            while True:
+                item, error = await items.get()
+                room.release()
+                if item is _DONE:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            self._stopped.set()
+
+
+def iterate_in_db_thread(func, *args, maxsize=4, **kwargs):
+    return DbThreadIterator(func, *args, maxsize=maxsize, **kwargs)
@@ -1,4 +1,164 @@
+import json
+
+from django.core.exceptions import SuspiciousOperation
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from strawberry.django.views import AsyncGraphQLView
+from strawberry.exceptions import MissingQueryError
+from strawberry.http import parse_request_data
+
+from adapt.columnar import encode_table, pack_table
+from adapt.documents import PersistedQueryMismatch, PersistedQueryNotFound, persisted_queries
+from adapt.export import CONTENT_TYPES, export, get_filters, get_order_bys
+from adapt.filters import FilterError
+from adapt.graphql import build_table
+from adapt.instrumentation import resolver_metrics
+from adapt.pages import page_cache
+from adapt.pagination import PaginationError
 
 def app(request):
-    return render(request, "adapt/index.html")
\ No newline at end of file
+    return render(request, "adapt/index.html")
+
+def metrics(request):
+    """
+    For Prometheus to scrape, see ResolverProfilerExtension and adapt.pages
+    """
+    return HttpResponse(resolver_metrics.render() + page_cache.render(), content_type="text/plain; version=0.0.4")
+
+class PersistedQueryGraphQLView(AsyncGraphQLView):
+    """
+    An async GraphQLView which understands automatic persisted queries.
+    See adapt.documents.
+
+    The resolvers are async so this must be served by an async view.
+    """
+
+    def get_request_data(self, request):
+        try:
+            data = self.parse_body(request)
+        except json.decoder.JSONDecodeError:
+            raise SuspiciousOperation("Unable to parse request body as JSON")
+
+        if not isinstance(data, dict):
+            raise SuspiciousOperation("The request body must be a JSON object")
+
+        extensions = data.get("extensions") or {}
+        if isinstance(extensions, str):
+            # GET requests send the extensions as a json string
+            try:
+                extensions = json.loads(extensions)
+            except json.decoder.JSONDecodeError:
+                raise SuspiciousOperation("Unable to parse extensions as JSON")
+        if not isinstance(extensions, dict):
+            raise SuspiciousOperation("extensions must be a JSON object")
+
+        if (persisted_query := extensions.get("persistedQuery")) is not None:
+            if not isinstance(persisted_query, dict):
+                raise SuspiciousOperation("persistedQuery must be a JSON object")
+            query_hash = persisted_query.get("sha256Hash")
+            if not isinstance(query_hash, str):
+                raise SuspiciousOperation("persistedQuery has no sha256Hash")
+            if data.get("query"):
+                if not isinstance(data["query"], str):
+                    raise SuspiciousOperation("query must be a string")
+                persisted_queries.register(query_hash, data["query"])
+            else:
+                data["query"] = persisted_queries.get(query_hash)
+
+        try:
+            return parse_request_data(data)
+        except MissingQueryError:
+            raise SuspiciousOperation("No GraphQL query found in the request")
+
+    @method_decorator(csrf_exempt)
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except (PersistedQueryNotFound, PersistedQueryMismatch) as error:
+            return JsonResponse({
+                "data": None,
+                "errors": [{"message": error.message, "extensions": {"code": error.code}}],
+            })
+        except SuspiciousOperation as error:
+            return JsonResponse({"data": None, "errors": [{"message": str(error)}]}, status=400)
+
+
+class ExportView(View):
+    """
+    GET <model name>.<csv|ndjson> exports every row of one of the models of
+    registration, e.g.
+
+        /api/export/Person.csv?columns=id,name&search=smith&filters=[{"field": "age", "eq": "30"}]
+
+    filters and orderBy are json, in the same form as the table query
+    takes them.
+    """
+
+    registration = None
+
+    def get(self, request, model, format):
+        try:
+            metadata = self.registration["registry"].get(model)
+            columns = request.GET.get("columns")
+            content = export(
+                metadata,
+                format,
+                columns=columns.split(",") if columns else None,
+                filters=get_filters(json.loads(request.GET.get("filters", "[]"))),
+                order_by=get_order_bys(json.loads(request.GET.get("orderBy", "[]"))),
+                search=request.GET.get("search"),
+            )
+        except (FilterError, LookupError, ValueError) as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[format])
+        response["Content-Disposition"] = f'attachment; filename="{model}.{format}"'
+        return response
+
+
+class TableView(View):
+    """
+    GET <model name>.msgpack is a page of the table query as MessagePack,
+    one array per column, see adapt.columnar.  It takes the same parameters
+    as ExportView along with first, after, last and before, e.g.
+
+        /api/table/Person.msgpack?columns=id,name,gender&first=500&after=WzEwXQ==
+    """
+
+    registration = None
+
+    def get(self, request, model):
+        try:
+            metadata = self.registration["registry"].get(model)
+            columns = request.GET.get("columns")
+            first, last = request.GET.get("first"), request.GET.get("last")
+            table = build_table(
+                metadata,
+                first=int(first) if first else None,
+                after=request.GET.get("after"),
+                last=int(last) if last else None,
+                before=request.GET.get("before"),
+                filters=get_filters(json.loads(request.GET.get("filters", "[]"))),
+                order_by=get_order_bys(json.loads(request.GET.get("orderBy", "[]"))),
+                search=request.GET.get("search"),
+                columns=columns.split(",") if columns else None,
+            )
+        except (FilterError, PaginationError, LookupError, ValueError) as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        page = encode_table(
+            [column.field for column in table.columns],
+            [column.type for column in table.columns],
+            table.values,
+        )
+        page_info = table.page_info
+        page["pageInfo"] = {
+            "hasNextPage": page_info.has_next_page,
+            "hasPreviousPage": page_info.has_previous_page,
+            "startCursor": page_info.start_cursor,
+            "endCursor": page_info.end_cursor,
+        }
+        return HttpResponse(pack_table(page), content_type="application/x-msgpack")
@@ -1 +1 @@
-from dummy.admin import schema
\ No newline at end of file
+from dummy.admin import registration, schema
\ No newline at end of file
@@ -1,5 +1,10 @@
-from api.schema import schema
+from api.schema import registration, schema
 from django.urls import path
-from strawberry.django.views import GraphQLView
+from adapt.views import ExportView, PersistedQueryGraphQLView, TableView, metrics
 
-urlpatterns = [path("graphql", GraphQLView.as_view(schema=schema))]
\ No newline at end of file
+urlpatterns = [
+    path("graphql", PersistedQueryGraphQLView.as_view(schema=schema)),
+    path("export/<str:model>.<str:format>", ExportView.as_view(registration=registration)),
+    path("table/<str:model>.msgpack", TableView.as_view(registration=registration)),
+    path("metrics", metrics),
+]
\ No newline at end of file
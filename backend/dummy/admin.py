@@ -3,4 +3,5 @@ from adapt.graphql import register
 from dummy.models import Person
 
 admin.site.register(Person)
-schema = register([Person])["schema"]
\ No newline at end of file
+registration = register([Person])
+schema = registration["schema"]
\ No newline at end of file
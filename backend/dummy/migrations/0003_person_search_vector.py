@@ -0,0 +1,19 @@
+# Generated by Django 4.0.6 on 2026-10-18 19:07
+
+import adapt.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dummy', '0002_alter_person_address_alter_person_spouse_and_more'),
+    ]
+
+    operations = [
+        adapt.search.AddSearchVector(
+            model_name='Person',
+            fields=['name'],
+            config='simple',
+        ),
+    ]
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proj.settings')
 
 application = get_asgi_application()
+
+if getattr(settings, 'ADAPT_PREWARM_SCHEMA', False):
+    # build the graphql schemas now rather than on the first request
+    from adapt.graphql import warm_schemas
+    warm_schemas()
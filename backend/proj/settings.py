@@ -92,6 +92,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'proj.wsgi.application'
+ASGI_APPLICATION = 'proj.asgi.application'
 
 
 # Database
@@ -151,3 +152,8 @@ STATICFILES_DIRS = [ BASE_DIR / "static" , ]
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# full text search on Postgres, see adapt.search
+ADAPT_FULL_TEXT_SEARCH = {
+    "dummy.Person": ["name"],
+}
@@ -1,9 +1,30 @@
 import { createRoot } from 'react-dom/client';
-import { ApolloClient, InMemoryCache, ApolloProvider } from '@apollo/client';
+import {
+  ApolloClient,
+  ApolloProvider,
+  HttpLink,
+  InMemoryCache,
+} from '@apollo/client';
+import { createPersistedQueryLink } from '@apollo/client/link/persisted-queries';
 import Init from './init';
 
+async function sha256(query) {
+  const digest = await crypto.subtle.digest(
+    'SHA-256',
+    new TextEncoder().encode(query),
+  );
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, '0'))
+    .join('');
+}
+
+// Only the hash of each query is sent, once the server has seen the query
+const link = createPersistedQueryLink({ sha256 }).concat(
+  new HttpLink({ uri: 'http://localhost:8000/api/graphql' }),
+);
+
 const client = new ApolloClient({
-  uri: 'http://localhost:8000/api/graphql',
+  link,
   cache: new InMemoryCache(),
 });
 
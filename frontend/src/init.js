@@ -3,7 +3,10 @@ import App from './App';
 
 const GET_STATE = gql`
   query GET_STATE {
-    state
+    state {
+      version
+      state
+    }
   }
 `;
 
@@ -19,7 +22,7 @@ function Init() {
   let initialState;
 
   try {
-    initialState = JSON.parse(data.state);
+    initialState = JSON.parse(data.state.state);
   } catch (e) {
     initialState = DEFAULT;
   }